@@ -0,0 +1,162 @@
+"""Offline throughput benchmarks for the App Store Connect client.
+
+Starts the local stub server in its own process, then runs every client mode in a fresh
+interpreter so peak RSS and CPU time belong to that mode alone. Reports requests/sec,
+p50/p99 latency, peak RSS and CPU time per call. No network access or credentials needed,
+a throwaway signing key is generated for every run.
+
+    python benchmarks/bench_client.py                           # all modes
+    python benchmarks/bench_client.py --modes sync threaded --calls 2000 --latency 0.005
+    python benchmarks/bench_client.py --save baseline.json
+    python benchmarks/bench_client.py --baseline baseline.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+from bench_common import compare, start_server, write_key
+
+MODES = ('sync', 'threaded', 'async', 'paginate', 'report', 'upload')
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def run_mode(mode, base_url, calls, concurrency):
+    # runs inside the child interpreter and returns the measurements as a dict
+    from apple_api import AppStoreConnect, AsyncAppStoreConnect, RetryPolicy
+
+    latencies = []
+
+    def record(event):
+        if event.kind == 'request':
+            latencies.append(event.latency)
+
+    workdir = tempfile.mkdtemp(prefix='asc-bench-')
+    options = dict(base_api=base_url, hooks=[record], retry=RetryPolicy(backoff_factor=0.05),
+                   pool_maxsize=concurrency)
+    key_file = write_key(workdir)
+    ids = [str(number) for number in range(1, calls + 1)]
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    if mode == 'async':
+        async def main():
+            async with AsyncAppStoreConnect('BENCH', key_file, 'issuer', max_concurrency=concurrency,
+                                            **options) as api:
+                await api.map(api.get_subscription_group, ids)
+
+        asyncio.run(main())
+    else:
+        with AppStoreConnect('BENCH', key_file, 'issuer', app_id='app-1', **options) as api:
+            if mode == 'sync':
+                for sg_id in ids:
+                    api.get_subscription_group(sg_id)
+            elif mode == 'threaded':
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(api.get_subscription_group, ids))
+            elif mode == 'paginate':
+                for _ in api.iter_builds():
+                    pass
+            elif mode == 'report':
+                for _ in api.iter_report_rows('/v1/salesReports'):
+                    pass
+            elif mode == 'upload':
+                file_path = os.path.join(workdir, 'screenshot.png')
+                with open(file_path, 'wb') as file:
+                    file.write(os.urandom(4 * 1024 * 1024))
+                for iap_id in ids[:max(1, calls // 100)]:
+                    api.create_iap_review_screenshot_request(iap_id, file_path)
+            else:
+                raise ValueError(f"unknown mode '{mode}'")
+
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    requests = len(latencies)
+    return {
+        'mode': mode,
+        'requests': requests,
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed if elapsed else None,
+        'p50_ms': (_percentile(latencies, 0.5) or 0) * 1000,
+        'p99_ms': (_percentile(latencies, 0.99) or 0) * 1000,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'cpu_ms_per_call': cpu * 1000 / requests if requests else None,
+    }
+
+
+def _run_child(mode, base_url, args):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, '--base-url', base_url,
+               '--calls', str(args.calls), '--concurrency', str(args.concurrency)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _print_table(results):
+    header = f"{'mode':<10}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'rss MB':>10}{'cpu ms/call':>13}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['mode']:<10}{result['requests']:>10}{result['requests_per_second']:>10.1f}"
+              f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['peak_rss_mb']:>10.1f}"
+              f"{result['cpu_ms_per_call']:>13.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--calls', type=int, default=1000, help='calls per mode (uploads use calls / 100)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--builds', type=int, default=20000)
+    parser.add_argument('--report-rows', type=int, default=200000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the stub adds to every request')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--save', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='fail when req/s drops below a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child, args.base_url, args.calls, args.concurrency)))
+        return 0
+
+    server, base_url = start_server('--port', args.port, '--builds', args.builds, '--report-rows', args.report_rows,
+                                    '--latency', args.latency, '--throttle-rate', args.throttle_rate)
+    try:
+        results = [_run_child(mode, base_url, args) for mode in args.modes]
+    finally:
+        server.terminate()
+        server.wait()
+
+    _print_table(results)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance, 'mode', 'requests_per_second', 'req/s')
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Helpers shared by the benchmark scripts: a throwaway signing key, the stub server in its
+own process and the comparison against a saved baseline."""
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_key(directory):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    path = os.path.join(directory, 'AuthKey_BENCH.p8')
+    with open(path, 'wb') as file:
+        file.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption()))
+    return path
+
+
+def start_server(*options):
+    # options are stub_server.py command line arguments, returns (process, base url)
+    command = [sys.executable, os.path.join(HERE, 'stub_server.py'), *map(str, options)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('serving on '):
+        process.kill()
+        raise RuntimeError(f"stub server failed to start: {line!r}")
+    return process, line.split('serving on ', 1)[1].strip()
+
+
+def compare(results, baseline_path, tolerance, name, metric, unit, higher_is_better=True):
+    # results (and the baseline) are lists of dicts identified by `name`; returns one line
+    # per result whose `metric` got worse than the baseline by more than `tolerance`
+    with open(baseline_path) as file:
+        baseline = {result[name]: result for result in json.load(file)}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result[name])
+        if not previous:
+            continue
+        if higher_is_better:
+            worse = result[metric] < previous[metric] * (1 - tolerance)
+        else:
+            worse = result[metric] > previous[metric] * (1 + tolerance)
+        if worse:
+            regressions.append(f"{result[name]}: {result[metric]:.1f} {unit}, baseline {previous[metric]:.1f} {unit}")
+    return regressions
@@ -0,0 +1,105 @@
+"""Import time and cold start benchmarks for the App Store Connect client.
+
+Every sample runs in a fresh interpreter, the way a CLI or serverless invocation does, and
+measures one stage from a clean module cache: importing the package, constructing a client
+and making the first request (against the local stub server, token minting included).
+Reports the median and min time per stage and how many modules the stage left loaded.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --stages import client --repeat 30
+    python benchmarks/bench_import.py --save import-baseline.json
+    python benchmarks/bench_import.py --baseline import-baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_common import compare, start_server, write_key
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), 'src')
+
+# code timed in the child, `key_file` and `base_url` are defined there
+STAGES = {
+    'import': "import apple_api",
+    'client': "from apple_api import AppStoreConnect\n"
+              "AppStoreConnect('BENCH', key_file, 'issuer', base_api=base_url)",
+    'async_client': "from apple_api import AsyncAppStoreConnect\n"
+                    "AsyncAppStoreConnect('BENCH', key_file, 'issuer', base_api=base_url)",
+    'first_call': "from apple_api import AppStoreConnect\n"
+                  "AppStoreConnect('BENCH', key_file, 'issuer', base_api=base_url).get_subscription_group('1')",
+}
+
+CHILD = """
+import sys, time
+sys.path.insert(0, {src!r})
+key_file, base_url = {key_file!r}, {base_url!r}
+modules = len(sys.modules)
+started = time.perf_counter()
+exec(compile({code!r}, 'stage', 'exec'))
+print(time.perf_counter() - started, len(sys.modules) - modules)
+"""
+
+
+def run_stage(stage, key_file, base_url, repeat):
+    source = CHILD.format(src=SRC, key_file=key_file, base_url=base_url, code=STAGES[stage])
+    samples, modules = [], 0
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', source], check=True, stdout=subprocess.PIPE, text=True).stdout
+        seconds, modules = output.split()
+        samples.append(float(seconds) * 1000)
+
+    return {
+        'stage': stage,
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'modules': int(modules),
+    }
+
+
+def _print_table(results):
+    header = f"{'stage':<14}{'median ms':>12}{'min ms':>10}{'modules':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        print(f"{result['stage']:<14}{result['median_ms']:>12.1f}{result['min_ms']:>10.1f}{result['modules']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=15, help='fresh interpreters per stage')
+    parser.add_argument('--save', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='fail when a stage gets slower than a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='asc-bench-')
+    key_file = write_key(workdir)
+    server, base_url = start_server('--port', 0)
+    try:
+        results = [run_stage(stage, key_file, base_url, args.repeat) for stage in args.stages]
+    finally:
+        server.terminate()
+        server.wait()
+
+    _print_table(results)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance, 'stage', 'median_ms', 'ms',
+                              higher_is_better=False)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
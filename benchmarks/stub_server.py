@@ -0,0 +1,360 @@
+"""Local stand-in for api.appstoreconnect.apple.com used by the benchmarks.
+
+Serves paginated /v1/builds, /v1/apps, /v1/certificates, /v1/profiles and related collections
+(/v1/apps/{id}/inAppPurchasesV2), gzipped /v1/salesReports, the in-app purchase review
+screenshot reservation -> PUT -> PATCH flow and a generic single-resource response for every
+other GET. Latency and 429s can be injected, every response carries an X-Rate-Limit header.
+No authentication is performed.
+
+    python benchmarks/stub_server.py --port 8080 --latency 0.02 --throttle-rate 0.05
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+MAX_PAGE_SIZE = 200
+MAX_PRICE_POINTS_PAGE_SIZE = 8000
+FIRST_UPLOAD = datetime(2023, 1, 1)
+LOCALES = ('en-US', 'de-DE', 'fr-FR')  # of the three resources in every localization listing
+TERRITORIES = ['USA', 'DEU', 'FRA', 'GBR', 'JPN', 'CAN', 'AUS', 'IND', 'BRA', 'CHN']  # the rest are T00, T01, ...
+
+
+class StubState:
+    def __init__(self, builds=5000, apps=50, report_rows=100000, latency=0.0, throttle_rate=0.0,
+                 hourly_limit=1000000, upload_parts=3, certificates=10, profiles=40, territories=175,
+                 price_tiers=100, builds_per_version=1, record=False):
+        self.builds = builds
+        self.apps = apps
+        self.certificates = certificates
+        self.profiles = profiles
+        self.territories = TERRITORIES[:territories] + [f'T{number:02d}' for number in
+                                                        range(max(0, territories - len(TERRITORIES)))]
+        self.price_tiers = price_tiers
+        self.builds_per_version = builds_per_version  # > 1 gives one build number several uploads
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.hourly_limit = hourly_limit
+        self.upload_parts = upload_parts
+        self.report = self._build_report(report_rows)
+        self.requests = 0
+        self.throttled = 0
+        self.reservations = {}
+        self.record = record
+        self.calls = []  # (method, path, Authorization header) of every request when recording
+        self.faults = []
+        self.lock = threading.Lock()
+
+    def fail(self, method, match, status, times=None):
+        # answers `method` requests whose unquoted path contains `match` with `status`,
+        # `times` times or until the server stops
+        with self.lock:
+            self.faults.append([method.upper(), match, status, times])
+
+    @staticmethod
+    def _build_report(rows):
+        lines = ['Provider\tProvider Country\tSKU\tDeveloper\tTitle\tVersion\tUnits\tDeveloper Proceeds\tBegin Date']
+        lines.extend(f'APPLE\tUS\tsku.{i}\tDeveloper\tTitle {i}\t1.0\t{i % 7 + 1}\t{i % 13}.99\t01/01/2023'
+                     for i in range(rows))
+        return gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def _resource(resource_type, resource_id, **attributes):
+    return {'type': resource_type, 'id': str(resource_id), 'attributes': attributes,
+            'links': {'self': f'/v1/{resource_type}/{resource_id}'}}
+
+
+def _build(number, per_version=1):
+    states = ('VALID', 'VALID', 'VALID', 'PROCESSING', 'FAILED')
+    build = _resource('builds', f'build-{number}', version=str(number // per_version),
+                      uploadedDate=(FIRST_UPLOAD + timedelta(minutes=number)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+                      processingState=states[number % len(states)], minOsVersion='13.0',
+                      usesNonExemptEncryption=False)
+    build['relationships'] = {'app': {'data': {'type': 'apps', 'id': f'app-{number // per_version % 5}'}}}
+    return build
+
+
+def _certificate(number):
+    content = base64.b64encode(hashlib.sha256(f'certificate {number}'.encode()).digest() * 32).decode()
+    return _resource('certificates', f'cert-{number}', name=f'Distribution {number}', serialNumber=f'{number:016X}',
+                     certificateType='DISTRIBUTION', expirationDate='2030-01-01T00:00:00Z',
+                     certificateContent=content)
+
+
+def _profile(number):
+    content = base64.b64encode(hashlib.sha256(f'profile {number}'.encode()).digest() * 256).decode()
+    return _resource('profiles', f'profile-{number}', name=f'Profile {number}',
+                     uuid=f'00000000-0000-0000-0000-{number:012d}', profileType='IOS_APP_STORE', profileState='ACTIVE', expirationDate='2030-01-01T00:00:00Z',
+                     profileContent=content)
+
+
+def _price_point(iap_id, territory, tier):
+    point = _resource('inAppPurchasePricePoints', f'{iap_id}-{territory}-{tier}', customerPrice=f'{tier}.99',
+                      proceeds=f'{tier * 0.7:.2f}', priceTier=str(tier + 1))
+    point['relationships'] = {'territory': {'data': {'type': 'territories', 'id': territory}}}
+    return point
+
+
+def _app(number):
+    return _resource('apps', f'app-{number}', name=f'App {number}', bundleId=f'com.example.app{number}',
+                     sku=f'SKU{number}', primaryLocale='en-US')
+
+
+def _field(resource, name):
+    if name == 'id':
+        return resource['id']
+    if name in resource['attributes']:
+        return resource['attributes'][name]
+    data = ((resource.get('relationships') or {}).get(name) or {}).get('data')
+    return data['id'] if isinstance(data, dict) else None
+
+
+SIGNING_ASSETS = {'certificates': _certificate, 'profiles': _profile}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AppStoreConnectStub/1.0'
+    disable_nagle_algorithm = True     # headers and body are written separately
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def _respond(self, status, body=b'', content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        with self.state.lock:
+            remaining = max(0, self.state.hourly_limit - self.state.requests)
+        self.send_header('X-Rate-Limit', f'user-hour-lim:{self.state.hourly_limit};user-hour-rem:{remaining};')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status, document):
+        self._respond(status, json.dumps(document).encode('utf-8'))
+
+    def _fault(self):
+        path = unquote(self.path)
+        with self.state.lock:
+            for fault in self.state.faults:
+                method, match, status, times = fault
+                if method == self.command and match in path and times != 0:
+                    if times is not None:
+                        fault[3] -= 1
+                    return status
+        return None
+
+    def _before(self):
+        # returns False when the request was answered with an injected 429 or fault
+        with self.state.lock:
+            self.state.requests += 1
+            if self.state.record:
+                self.state.calls.append((self.command, self.path, self.headers.get('Authorization')))
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        if self.state.throttle_rate and random.random() < self.state.throttle_rate:
+            with self.state.lock:
+                self.state.throttled += 1
+            self._json(429, {'errors': [{'status': '429', 'code': 'RATE_LIMIT_EXCEEDED'}]})
+            return False
+        status = self._fault()
+        if status is not None:
+            self._json(status, {'errors': [{'status': str(status)}]})
+            return False
+        return True
+
+    def _page(self, path, query, total, factory, max_limit=MAX_PAGE_SIZE):
+        # honours limit, sort=-<attribute> (newest first), filter[<id, attribute or relationship>]
+        # and fields[<type>]
+        limit = min(int(query.get('limit', ['50'])[0]), max_limit)
+        cursor = int(query.get('cursor', ['0'])[0])
+        numbers = range(total - 1, -1, -1) if query.get('sort', [''])[0].startswith('-') else range(total)
+        for name, values in query.items():
+            if name.startswith('filter['):
+                field, wanted = name[len('filter['):-1], set(values[0].split(','))
+                numbers = [number for number in numbers if _field(factory(number), field) in wanted]
+        data = [factory(number) for number in numbers[cursor:cursor + limit]]
+        for resource in data:
+            fields = query.get(f"fields[{resource['type']}]")
+            if fields:
+                wanted = fields[0].split(',')
+                resource['attributes'] = {name: value for name, value in resource['attributes'].items()
+                                          if name in wanted}
+        links = {'self': f'{self.server.base_url}{path}'}
+        if cursor + limit < len(numbers):
+            passed = ''.join(f'&{name}={values[0]}' for name, values in query.items()
+                             if name == 'sort' or name.startswith(('filter[', 'fields[')))
+            links['next'] = f'{self.server.base_url}{path}?cursor={cursor + limit}&limit={limit}{passed}'
+        self._json(200, {'data': data, 'links': links, 'meta': {'paging': {'total': total, 'limit': limit}}})
+
+    def do_GET(self):
+        if not self._before():
+            return
+
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        if parts.path == '/v1/builds':
+            self._page(parts.path, query, self.state.builds,
+                       lambda number: _build(number, self.state.builds_per_version))
+        elif parts.path == '/v1/apps':
+            self._page(parts.path, query, self.state.apps, _app)
+        elif parts.path == '/v1/certificates':
+            self._page(parts.path, query, self.state.certificates, _certificate)
+        elif parts.path == '/v1/profiles':
+            self._page(parts.path, query, self.state.profiles, _profile)
+        elif parts.path in ('/v1/salesReports', '/v1/financeReports'):
+            self._respond(200, self.state.report, content_type='application/a-gzip')
+        else:
+            segments = [segment for segment in parts.path.split('/') if segment]
+            if len(segments) == 4 and segments[3] == 'pricePoints':
+                # every tier in every territory, filter[territory] narrows the territories
+                territories = self.state.territories
+                if 'filter[territory]' in query:
+                    wanted = query['filter[territory]'][0].split(',')
+                    territories = [territory for territory in territories if territory in wanted]
+                tiers = self.state.price_tiers
+                return self._page(parts.path, query, len(territories) * tiers,
+                                  lambda number: _price_point(segments[2], territories[number // tiers],
+                                                              number % tiers),
+                                  max_limit=MAX_PRICE_POINTS_PAGE_SIZE)
+            if len(segments) == 4:
+                # related collection, e.g. /v1/apps/{id}/inAppPurchasesV2
+                related_type = segments[3].replace('V2', '')
+                extra = {'locale': LOCALES} if related_type.endswith('Localizations') else {}
+                return self._page(parts.path, query, 3,
+                                  lambda number: _resource(related_type, f'{segments[2]}-{related_type}-{number}',
+                                                           name=f'{related_type} {number}',
+                                                           **{name: values[number] for name, values in extra.items()}))
+            if len(segments) == 3 and segments[1] in SIGNING_ASSETS:
+                return self._json(200, {'data': SIGNING_ASSETS[segments[1]](int(segments[2].rsplit('-', 1)[-1]))})
+            resource_type = segments[1] if len(segments) > 1 else 'resources'
+            resource_id = segments[2] if len(segments) > 2 else '1'
+            self._json(200, {'data': _resource(resource_type, resource_id, name=f'{resource_type} {resource_id}'),
+                             'links': {'self': f'{self.server.base_url}{parts.path}'}})
+
+    def do_POST(self):
+        body = json.loads(self._read_body() or b'{}')
+        if not self._before():
+            return
+
+        data = body.get('data') or {}
+        if self.path == '/v1/inAppPurchaseAppStoreReviewScreenshots':
+            size = data['attributes']['fileSize']
+            with self.state.lock:
+                reservation_id = f"screenshot-{len(self.state.reservations) + 1}"
+                self.state.reservations[reservation_id] = {}
+            part_size = -(-size // self.state.upload_parts)
+            operations = [{
+                'method': 'PUT',
+                'url': f'{self.server.base_url}/upload/{reservation_id}/{offset}',
+                'offset': offset,
+                'length': min(part_size, size - offset),
+                'requestHeaders': [{'name': 'Content-Type', 'value': 'image/png'}],
+            } for offset in range(0, size, part_size)]
+            self._json(201, {'data': {'type': 'inAppPurchaseAppStoreReviewScreenshots', 'id': reservation_id,
+                                      'attributes': {'fileSize': size, 'uploadOperations': operations}}})
+        else:
+            self._json(201, {'data': _resource(data.get('type', 'resources'), f'created-{self.state.requests}',
+                                               **(data.get('attributes') or {}))})
+
+    def do_PUT(self):
+        body = self._read_body()
+        if not self._before():
+            return
+
+        _, _, reservation_id, offset = self.path.split('/')
+        with self.state.lock:
+            self.state.reservations.setdefault(reservation_id, {})[int(offset)] = body
+        self._respond(200)
+
+    def do_PATCH(self):
+        body = json.loads(self._read_body() or b'{}')
+        if not self._before():
+            return
+
+        reservation_id = self.path.rsplit('/', 1)[-1]
+        attributes = body['data'].get('attributes') or {}
+        parts = self.state.reservations.get(reservation_id)
+        if parts is not None and 'sourceFileChecksum' in attributes:
+            uploaded = b''.join(parts[offset] for offset in sorted(parts))
+            state = 'COMPLETE' if hashlib.md5(uploaded).hexdigest() == attributes['sourceFileChecksum'] else 'FAILED'
+            attributes = dict(attributes, assetDeliveryState={'state': state})
+        self._json(200, {'data': {'type': body['data']['type'], 'id': reservation_id, 'attributes': attributes}})
+
+    def do_DELETE(self):
+        if self._before():
+            self._respond(204)
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    request_queue_size = 256    # concurrent clients open many connections at once
+
+
+class StubServer:
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.state = StubState(**options)
+        self.httpd = _HTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.httpd.base_url = f'http://{host}:{self.httpd.server_address[1]}'
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return self.httpd.base_url
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--builds', type=int, default=5000)
+    parser.add_argument('--apps', type=int, default=50)
+    parser.add_argument('--report-rows', type=int, default=100000)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--hourly-limit', type=int, default=1000000, help='quota reported in X-Rate-Limit')
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, builds=args.builds, apps=args.apps, report_rows=args.report_rows,
+                        latency=args.latency, throttle_rate=args.throttle_rate, hourly_limit=args.hourly_limit)
+    print(f'serving on {server.base_url}', flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -22,6 +22,10 @@ setup(
         'six==1.16.0',
         'urllib3==1.26.13',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.8'],
+        'speedups': ['orjson>=3.6'],
+    },
     entry_points={
         'console_scripts': []
     }
@@ -1 +1,44 @@
-from .api import AppStoreConnect
+import importlib
+
+# public names and the module defining them. Modules are imported on first access, so
+# `import apple_api` does not pay for requests, aiohttp or cryptography up front
+_EXPORTS = {
+    'AppStoreConnect': 'api',
+    'AsyncAppStoreConnect': 'async_api',
+    'ClientPool': 'pool',
+    'FileTokenStore': 'tokens',
+    'MemoryTokenStore': 'tokens',
+    'RateLimiter': 'ratelimit',
+    'RetryPolicy': 'ratelimit',
+    'MemoryBackend': 'cache',
+    'ResponseCache': 'cache',
+    'SQLiteBackend': 'cache',
+    'PricePointIndex': 'pricing',
+    'PricePointStore': 'pricing',
+    'ReportSync': 'report_sync',
+    'CatalogMirror': 'mirror',
+    'SigningAssetSync': 'signing',
+    'BuildWatcher': 'watcher',
+    'Provisioner': 'provisioning',
+    'Document': 'resources',
+    'Resource': 'resources',
+    'Query': 'query',
+    'MetricsCollector': 'metrics',
+    'RequestEvent': 'metrics',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
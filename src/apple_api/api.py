@@ -1,24 +1,47 @@
-import hashlib
-import mimetypes
 import os
+import threading
+import weakref
+from urllib.parse import urlsplit
 
-import requests
-import jwt
-import gzip
 from datetime import datetime, timedelta
 import time
 import json
 import base64
 
+from .cache import endpoint_template
+from .coalesce import SingleFlight
 from .exceptions import *
+from .lazy import LazyModule
+from .metrics import RequestEvent, body_size, emit
+from .pagination import DEFAULT_PAGE_SIZE, iter_pages, iter_resources
+from .query import Query, add_query, as_query
+from .ratelimit import RateLimiter, RetryPolicy
+from .reports import CHUNK_SIZE, iter_tsv_rows, write_chunks
 
 ALGORITHM = 'ES256'
 BASE_API = "https://api.appstoreconnect.apple.com"
 
+# loaded on first use, most of the import time of the package is spent in these
+requests = LazyModule('requests')
+jwt = LazyModule('jwt')
+gzip = LazyModule('gzip')
+mimetypes = LazyModule('mimetypes')
+# modules of the package that only some endpoints need, they pull in hashlib, mmap, orjson,
+# tempfile and friends, so building a client does not load them either
+l10n = LazyModule(f'{__package__}.localizations')
+resources = LazyModule(f'{__package__}.resources')
+signing = LazyModule(f'{__package__}.signing')
+tokens = LazyModule(f'{__package__}.tokens')
+uploads = LazyModule(f'{__package__}.uploads')
+
 
 class AppStoreConnect:
-    def __init__(self, key_id, key_file, issuer_id, app_id=None, bundle_id=None):
+    def __init__(self, key_id, key_file, issuer_id, app_id=None, bundle_id=None,
+                 pool_connections=10, pool_maxsize=10, keep_alive=True, timeout=None, adapter=None,
+                 rate_limiter=None, retry=None, cache=None, hooks=None, base_api=BASE_API, token_store=None,
+                 coalesce=False):
         self._token = None
+        self._token_lock = threading.Lock()
         self.token_gen_date = None
         self.exp = None
         self.key_id = key_id
@@ -26,21 +49,118 @@ class AppStoreConnect:
         self.issuer_id = issuer_id
         self.app_id = app_id
         self.bundle_id = bundle_id
+        self.base_api = base_api.rstrip('/')
         self._debug = False
-        token = self.token  # generate first token
+
+        # connection pool shared by every endpoint method; sessions are per thread
+        # but all of them mount the same adapter, so sockets are reused across threads
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = timeout  # seconds, or a (connect, read) tuple
+        self._adapter = adapter
+        self._local = threading.local()
+        # weak, a session goes away with its thread; the sockets stay in the shared adapter
+        self._sessions = weakref.WeakSet()
+        self._sessions_lock = threading.Lock()
+        self._closed = False
+
+        # pass `False` to turn pacing or retries off
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter or None
+        self.retry = RetryPolicy() if retry is None else retry or None
+        self.cache = cache  # a ResponseCache, GET responses are only cached when one is given
+        self.hooks = list(hooks or [])  # callables receiving a RequestEvent, e.g. a MetricsCollector
+        self.token_store = token_store  # a MemoryTokenStore or FileTokenStore shared with other clients
+        # opt-in, concurrent identical GETs then share one request and the same response object
+        self._flights = SingleFlight() if coalesce else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def adapter(self):
+        if self._adapter is None:
+            with self._sessions_lock:
+                if self._adapter is None:
+                    self._adapter = requests.adapters.HTTPAdapter(pool_connections=self.pool_connections,
+                                                pool_maxsize=self.pool_maxsize)
+        return self._adapter
+
+    @property
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            if self._closed:
+                raise MethodNotAllowedException("client has been closed")
+
+            adapter = self.adapter
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            if not self.keep_alive:
+                session.headers['Connection'] = 'close'
+
+            with self._sessions_lock:
+                self._sessions.add(session)
+            self._local.session = session
+
+        return session
+
+    def close(self):
+        with self._sessions_lock:
+            self._closed = True
+            sessions, self._sessions = list(self._sessions), weakref.WeakSet()
+
+        for session in sessions:
+            session.close()
+        if self._adapter is not None:
+            self._adapter.close()
+        self._local = threading.local()
 
     @property
     def token(self):
-        # generate a new token every 15 minutes
-        if not self._token or self.token_gen_date + timedelta(minutes=15) < datetime.now():
-            self._token = self._generate_token()
+        # the first token is generated on first use and a new one every 15 minutes, minted in
+        # the background from minute 12 on; threads share one refresh instead of racing on it
+        if self._token_older_than(tokens.TOKEN_MAX_AGE):
+            with self._token_lock:
+                if self._token_older_than(tokens.TOKEN_MAX_AGE):
+                    self._refresh_token()
+        elif self._token_older_than(tokens.TOKEN_REFRESH_AGE) and self._token_lock.acquire(blocking=False):
+            threading.Thread(target=self._refresh_token_ahead, daemon=True).start()
 
         return self._token
 
+    def _token_older_than(self, seconds):
+        return not self._token or self.token_gen_date + timedelta(seconds=seconds) < datetime.now()
+
+    def _refresh_token_ahead(self):
+        try:
+            if self._token_older_than(tokens.TOKEN_REFRESH_AGE):
+                self._refresh_token()
+        except Exception:
+            pass  # the current token is still valid, the synchronous refresh will raise
+        finally:
+            self._token_lock.release()
+
+    def _refresh_token(self):
+        started = time.perf_counter()
+        if self.token_store is None:
+            token = self._generate_token()
+        else:
+            store_key = f"{self.issuer_id}:{self.key_id}:{self.bundle_id or ''}"
+            token, generated = self.token_store.get_or_create(store_key, tokens.TOKEN_REFRESH_AGE, self._generate_token)
+            self.token_gen_date = datetime.fromtimestamp(generated)
+        self._token = token
+        if self.hooks:
+            emit(self.hooks, RequestEvent('token', latency=time.perf_counter() - started))
+
     def _generate_token(self):
-        key = open(self.key_file, 'r').read()
+        key = tokens.load_signing_key(self.key_file, ALGORITHM)
         self.token_gen_date = datetime.now()
-        exp = int(time.mktime((self.token_gen_date + timedelta(minutes=20)).timetuple()))
+        exp = int(time.mktime((self.token_gen_date + timedelta(seconds=tokens.TOKEN_LIFETIME)).timetuple()))
         return jwt.encode(
             payload={
                 'iss': self.issuer_id,
@@ -56,82 +176,296 @@ class AppStoreConnect:
             algorithm=ALGORITHM
         ).decode('ascii')
 
-    def _api_call(self, uri, method="get", post_data=None, file_meta=None):
+    def _prepare_request(self, uri, method="get", post_data=None, file_meta=None):
+        method = method.lower()
         headers = {"Authorization": "Bearer %s" % self.token}
         if self._debug:
             print(uri)
-        r = {}
 
-        url = BASE_API + uri if method != 'put' and 'api.storekit' not in uri else uri
-        if method.lower() == "get":
-            r = requests.get(url, headers=headers)
-        elif method.lower() == "post":
-            headers["Content-Type"] = "application/json"
-            r = requests.post(url=url, headers=headers, data=json.dumps(post_data))
-        elif method.lower() == "patch":
+        # pagination links, upload urls and storekit urls are already absolute
+        url = uri if uri.startswith(('https://', 'http://')) else self.base_api + uri
+        data = None
+        if method in ("post", "patch"):
             headers["Content-Type"] = "application/json"
-            r = requests.patch(url=url, headers=headers, data=json.dumps(post_data))
-        elif method.lower() == "put":
+            data = json.dumps(post_data)
+        elif method == "put":
             headers["Content-Type"] = file_meta['content_type']
-            r = requests.put(url=url, headers=headers, data=file_meta['file'])
-        elif method.lower() == "delete":
-            r = requests.delete(url=url, headers=headers)
+            data = file_meta['file']
+        elif method not in ("get", "delete"):
+            raise MethodNotAllowedException(f"'{method}' is not a supported http method")
+
+        return method, url, headers, data
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def _endpoint(self, url):
+        # metrics label: api paths with ids normalized, upload urls by host
+        return endpoint_template(url) if url.startswith(self.base_api) else urlsplit(url).netloc
+
+    def _emit_request(self, method, url, data, started, status_code=None, retries=0, error=None, size=None):
+        emit(self.hooks, RequestEvent(
+            'request', method, self._endpoint(url), url,
+            status_code=status_code,
+            latency=time.perf_counter() - started,
+            bytes_sent=body_size(data),
+            bytes_received=size or 0,
+            retries=retries,
+            rate_limit_remaining=self.rate_limiter.remaining if self.rate_limiter else None,
+            error=error
+        ))
+
+    def _send(self, method, url, headers, data, stream=False, retry=None):
+        if not self.hooks:
+            return self._send_with_retries(method, url, headers, data, stream, retry)[0]
+
+        started = time.perf_counter()
+        try:
+            r, retries = self._send_with_retries(method, url, headers, data, stream, retry)
+        except Exception as exc:
+            self._emit_request(method, url, data, started, error=exc)
+            raise
+
+        size = int(r.headers.get('Content-Length') or 0) if stream else len(r.content)
+        self._emit_request(method, url, data, started, r.status_code, retries, size=size)
+        return r
+
+    def _send_with_retries(self, method, url, headers, data, stream=False, retry=None):
+        # paces requests against the key's hourly budget and retries throttled, failed
+        # or dropped requests; upload urls live on other hosts and are not paced
+        limiter = self.rate_limiter if url.startswith(self.base_api) else None
+        retry = retry or self.retry
+        attempt = 0
+        while True:
+            if limiter:
+                delay = limiter.acquire()
+                if delay:
+                    time.sleep(delay)
+
+            try:
+                r = self._session.request(method.upper(), url, headers=headers, data=data,
+                                          timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retry or not retry.should_retry_error(method, attempt):
+                    raise
+                delay = retry.backoff(attempt)
+            else:
+                if limiter:
+                    limiter.update(r.headers)
+                if not retry or not retry.should_retry_response(method, r.status_code, attempt):
+                    return r, attempt
+
+                if r.status_code == 429 and limiter:
+                    limiter.exhaust()
+                delay = retry.backoff(attempt, r.headers.get('Retry-After'))
+                r.close()
+
+            attempt += 1
+            if hasattr(data, 'seek'):
+                data.seek(0)
+            time.sleep(delay)
+
+    def _api_call(self, uri, method="get", post_data=None, file_meta=None, stream=False):
+        method, url, headers, data = self._prepare_request(uri, method, post_data, file_meta)
+        if self._flights is None:
+            return self._request(method, url, headers, data, post_data, stream)
+
+        if method == "get" and not stream:
+            r, shared = self._flights.do(url, self._request, method, url, headers, data)
+            if shared and self.hooks:
+                self._emit_coalesced(url, r)
+            return r
+
+        try:
+            return self._request(method, url, headers, data, post_data, stream)
+        finally:
+            if method != "get":
+                self._flights.forget()
+
+    def _emit_coalesced(self, url, r):
+        emit(self.hooks, RequestEvent('coalesced', 'get', self._endpoint(url), url, getattr(r, 'status_code', None)))
+
+    def _request(self, method, url, headers, data, post_data=None, stream=False):
+        if self.cache and method == "get" and not stream:
+            return self._cached_api_call(url, headers)
 
+        r = self._send(method, url, headers, data, stream=stream)
+        if stream:
+            # the caller consumes (and closes) the body, see iter_report_rows/download_report
+            return r
+
+        if self.cache and method != "get" and r.ok:
+            self.cache.invalidate(url, post_data)
+
+        return self._decode_response(r)
+
+    def _decode_response(self, r):
         try:
             content_type = r.headers['content-type']
         except KeyError:
             content_type = ''
 
         if content_type == 'application/a-gzip':
-            # TODO implement stream decompress
-            data_gz = b""
-            for chunk in r.iter_content(1024 * 1024):
-                if chunk:
-                    data_gz = data_gz + chunk
-
-            data = gzip.decompress(data_gz)
-            return data.decode("utf-8")
+            # the body is already buffered here, use iter_report_rows to keep memory flat
+            return gzip.decompress(r.content).decode("utf-8")
         else:
             return r
 
-    def fetch(self, uri, method="get", post_data=None):
-        return self._api_call(uri, method, post_data)
+    def _cached_api_call(self, url, headers):
+        key = self.cache.key(self.issuer_id, url)
+        entry = self.cache.get(key)
+        if entry and self.cache.is_fresh(entry):
+            if self.hooks:
+                emit(self.hooks, RequestEvent('cache', 'get', self._endpoint(url), url, entry['status_code']))
+            return self._response_from_cache(entry)
+
+        if entry:
+            headers.update(self.cache.conditional_headers(entry))
+
+        r = self._send("get", url, headers, None)
+        if entry and r.status_code == 304:
+            return self._response_from_cache(self.cache.refresh(key, entry))
+
+        if r.status_code == 200 and r.headers.get('content-type') != 'application/a-gzip':
+            self.cache.store(key, url, r.status_code, r.headers, r.content)
+
+        return self._decode_response(r)
+
+    def _response_from_cache(self, entry):
+        r = requests.Response()
+        r.status_code = entry['status_code']
+        r.headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+        r.url = entry['url']
+        r._content = entry['content']
+        return r
+
+    def fetch(self, uri, method="get", post_data=None, query=None):
+        return self._api_call(add_query(uri, query), method, post_data)
+
+    def fetch_document(self, uri, query=None):
+        # same as fetch() but returns a lazily parsed Document with indexed `included` resources
+        r = self._api_call(add_query(uri, query))
+        r.raise_for_status()
+        return resources.Document.from_response(r)
+
+    def _fetch_page(self, uri):
+        r = self._api_call(uri)
+        r.raise_for_status()
+        return r.json()
+
+    def iter_pages(self, uri, limit=DEFAULT_PAGE_SIZE, prefetch=True, query=None):
+        return iter_pages(self._fetch_page, add_query(uri, query, limit=limit), prefetch=prefetch)
+
+    def iter_resources(self, uri, limit=DEFAULT_PAGE_SIZE, prefetch=True, query=None):
+        return iter_resources(self._fetch_page, add_query(uri, query, limit=limit), prefetch=prefetch)
+
+    def iter_report_rows(self, uri):
+        # decompresses a gzipped report while it downloads and yields one dict per TSV row
+        with self._api_call(uri, stream=True) as r:
+            r.raise_for_status()
+            yield from iter_tsv_rows(r.iter_content(CHUNK_SIZE))
+
+    def download_report(self, uri, file_path, decompress=True):
+        with self._api_call(uri, stream=True) as r:
+            r.raise_for_status()
+            return write_chunks(r.iter_content(CHUNK_SIZE), file_path, decompress=decompress)
+
+    def _sales_report_uri(self, vendor_number, report_date, report_type, report_sub_type, frequency, version):
+        if not vendor_number or not report_date:
+            raise InvalidParameterException(f"'vendor_number' and 'report_date' are required for sales reports")
+
+        query = Query(filter={'frequency': frequency, 'reportDate': report_date, 'reportSubType': report_sub_type,
+                              'reportType': report_type, 'vendorNumber': vendor_number, 'version': version})
+        return query.apply("/v1/salesReports")
+
+    def get_sales_report(self, vendor_number=None, report_date=None, report_type='SALES', report_sub_type='SUMMARY',
+                         frequency='DAILY', version=None):
+        # report_date is YYYY-MM-DD for daily and weekly reports, YYYY-MM for monthly and YYYY for yearly ones
+        return self._api_call(self._sales_report_uri(vendor_number, report_date, report_type, report_sub_type,
+                                                     frequency, version))
+
+    def iter_sales_report_rows(self, vendor_number=None, report_date=None, report_type='SALES',
+                               report_sub_type='SUMMARY', frequency='DAILY', version=None):
+        return self.iter_report_rows(self._sales_report_uri(vendor_number, report_date, report_type,
+                                                            report_sub_type, frequency, version))
 
-    def list_apps(self):
-        return self._api_call("/v1/apps")
+    def _finance_report_uri(self, vendor_number, report_date, region_code, report_type):
+        if not vendor_number or not report_date:
+            raise InvalidParameterException(f"'vendor_number' and 'report_date' are required for finance reports")
 
-    def list_builds(self):
-        return self._api_call("/v1/builds")
+        query = Query(filter={'regionCode': region_code, 'reportDate': report_date, 'reportType': report_type,
+                              'vendorNumber': vendor_number})
+        return query.apply("/v1/financeReports")
 
-    def list_bundle_ids(self):
-        return self._api_call("/v1/bundleIds")
+    def get_finance_report(self, vendor_number=None, report_date=None, region_code='ZZ', report_type='FINANCIAL'):
+        # report_date is the fiscal month as YYYY-MM
+        return self._api_call(self._finance_report_uri(vendor_number, report_date, region_code, report_type))
 
-    def list_certificates(self):
-        return self._api_call("/v1/certificates")
+    def iter_finance_report_rows(self, vendor_number=None, report_date=None, region_code='ZZ',
+                                 report_type='FINANCIAL'):
+        return self.iter_report_rows(self._finance_report_uri(vendor_number, report_date, region_code, report_type))
+
+    def list_apps(self, query=None):
+        return self._api_call(add_query("/v1/apps", query))
+
+    def iter_apps(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/apps", limit=limit, query=query)
+
+    def list_builds(self, query=None):
+        return self._api_call(add_query("/v1/builds", query))
+
+    def iter_builds(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/builds", limit=limit, query=query)
+
+    def list_bundle_ids(self, query=None):
+        return self._api_call(add_query("/v1/bundleIds", query))
+
+    def iter_bundle_ids(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/bundleIds", limit=limit, query=query)
+
+    def list_certificates(self, query=None):
+        return self._api_call(add_query("/v1/certificates", query))
+
+    def iter_certificates(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/certificates", limit=limit, query=query)
 
     def download_certificate(self, certificatID=None, saveFolderPath=None):
+        r = self._api_call("/v1/certificates/" + certificatID)
+        return self._save_certificate(r, saveFolderPath)
+
+    def _save_certificate(self, r, saveFolderPath=None):
         try:
-            r = self._api_call("/v1/certificates/" + certificatID)
             r = r.json()
             attributes = r["data"]["attributes"]
             certificateContent = attributes["certificateContent"]
             name = attributes["name"]
-            saveFilePath = name + ".cer"
-            f = open(saveFilePath, "w")
-            f.write(base64.b64decode(certificateContent))
-            f.close()
+            saveFilePath = os.path.join(saveFolderPath or ".", name + ".cer")
+            signing.write_atomic(saveFilePath, base64.b64decode(certificateContent))
             return "success"
         except FileNotFoundError:
             return "failure"
 
-    def list_devices(self):
-        return self._api_call("/v1/devices")
+    def list_devices(self, query=None):
+        return self._api_call(add_query("/v1/devices", query))
 
-    def list_in_app_purchases(self, app_id=None):
+    def iter_devices(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/devices", limit=limit, query=query)
+
+    def list_in_app_purchases(self, app_id=None, query=None):
+        if not app_id:
+            raise InvalidParameterException(f"'app_id' is required for this endpoint")
+
+        return self._api_call(add_query(f"/v1/apps/{app_id}/inAppPurchasesV2", query))
+
+    def iter_in_app_purchases(self, app_id=None, limit=DEFAULT_PAGE_SIZE, query=None):
         if not app_id:
             raise InvalidParameterException(f"'app_id' is required for this endpoint")
 
-        return self._api_call(f"/v1/apps/{app_id}/inAppPurchasesV2")
+        return self.iter_resources(f"/v1/apps/{app_id}/inAppPurchasesV2", limit=limit, query=query)
 
     def create_iap_nr_subscription(self, name=None, product_id=None, review_note=None):
         if not name or not product_id:
@@ -161,11 +495,18 @@ class AppStoreConnect:
 
         return self._api_call("/v2/inAppPurchases", method="post", post_data=metadata)
 
-    def get_iap_purchase_localizations(self, iap_id=None):
+    def get_iap_purchase_localizations(self, iap_id=None, query=None):
+        if not iap_id:
+            raise InvalidParameterException(f"'iap_id' is required for listing price localizations")
+
+        return self._api_call(add_query(f"/v2/inAppPurchases/{iap_id}/inAppPurchaseLocalizations", query))
+
+    def iter_iap_purchase_localizations(self, iap_id=None, limit=50, query=None):
         if not iap_id:
             raise InvalidParameterException(f"'iap_id' is required for listing price localizations")
 
-        return self._api_call(f"/v2/inAppPurchases/{iap_id}/inAppPurchaseLocalizations")
+        return self.iter_resources(f"/v2/inAppPurchases/{iap_id}/inAppPurchaseLocalizations", limit=limit,
+                                   query=query)
 
     def create_iap_purchase_localization(self, iap_id=None, name=None, locale=None, description=None):
         if not iap_id or not name or not locale:
@@ -193,22 +534,75 @@ class AppStoreConnect:
 
         return self._api_call(f"/v1/inAppPurchaseLocalizations", method="post", post_data=metadata)
 
-    def get_iap_price_points(self, iap_id=None, country_code=None):
+    def update_iap_purchase_localization(self, localization_id=None, name=None, description=None):
+        if not localization_id:
+            raise InvalidParameterException("'localization_id' is mandatory parameter for updating localization")
+
+        attributes = {name: value for name, value in (('name', name), ('description', description))
+                      if value is not None}
+        metadata = {
+            'data': {
+                'id': localization_id,
+                'type': 'inAppPurchaseLocalizations',
+                'attributes': attributes
+            }
+        }
+
+        return self._api_call(f"/v1/inAppPurchaseLocalizations/{localization_id}", method="patch",
+                              post_data=metadata)
+
+    def delete_iap_purchase_localization(self, localization_id=None):
+        if not localization_id:
+            raise InvalidParameterException("'localization_id' is mandatory parameter for deleting localization")
+
+        return self._api_call(f"/v1/inAppPurchaseLocalizations/{localization_id}", method="delete")
+
+    def upsert_iap_purchase_localizations(self, iap_id=None, localizations=None, delete_missing=False, max_workers=4):
+        # localizations: {locale: {'name': .., 'description': ..}} or a list of dicts with a 'locale'.
+        # Only attributes that differ from the current state are sent
+        if not iap_id or localizations is None:
+            raise InvalidParameterException("'iap_id' and 'localizations' are mandatory parameters for "
+                                            "upserting localizations")
+
+        diff = l10n.diff_localizations(self.iter_iap_purchase_localizations(iap_id), localizations,
+                                       l10n.IAP_FIELDS, delete_missing)
+        return l10n.apply_diff(
+            diff,
+            lambda locale, attributes: self.create_iap_purchase_localization(
+                iap_id, attributes.get('name'), locale, attributes.get('description')),
+            lambda localization_id, attributes: self.update_iap_purchase_localization(
+                localization_id, attributes.get('name'), attributes.get('description')),
+            self.delete_iap_purchase_localization,
+            max_workers
+        )
+
+    def _iap_price_points_query(self, country_code=None, query=None):
+        query = Query().include('territory') if query is None else as_query(query)
+        if country_code:
+            query.filter('territory', country_code)     # country_code should be 3 letter ISO3 country code
+        return query
+
+    def get_iap_price_points(self, iap_id=None, country_code=None, query=None):
         if not iap_id:
             raise InvalidParameterException(f"'iap_id' is required for listing price points")
 
-        territory_filter = ""
-        if country_code:
-            territory_filter = f"&filter[territory]={country_code}"     # country_code should be 3 letter ISO3 country code
+        return self._api_call(add_query(f"/v2/inAppPurchases/{iap_id}/pricePoints",
+                                        self._iap_price_points_query(country_code, query)))
 
-        return self._api_call(f"/v2/inAppPurchases/{iap_id}/pricePoints?include=territory{territory_filter}")
+    def iter_iap_price_points(self, iap_id=None, country_code=None, limit=8000, query=None):
+        if not iap_id:
+            raise InvalidParameterException(f"'iap_id' is required for listing price points")
 
-    def get_iap_price_schedules(self, iap_id=None):
+        return self.iter_resources(f"/v2/inAppPurchases/{iap_id}/pricePoints", limit=limit,
+                                   query=self._iap_price_points_query(country_code, query))
+
+    def get_iap_price_schedules(self, iap_id=None, query=None):
         if not iap_id:
             raise InvalidParameterException(f"'iap_id' is required for listing price schedules")
 
         # return self._api_call(f"/v1/inAppPurchasePriceSchedules/{iap_id}?include=manualPrices")
-        return self._api_call(f"/v2/inAppPurchases/{iap_id}/iapPriceSchedule?include=manualPrices")
+        return self._api_call(add_query(f"/v2/inAppPurchases/{iap_id}/iapPriceSchedule",
+                                        Query(include='manualPrices') if query is None else query))
 
     def create_iap_price_schedule(self, iap_id=None, price_point_id=None, price=None, start_date=None):
         if not iap_id:
@@ -266,13 +660,14 @@ class AppStoreConnect:
 
         return self._api_call(f"/v1/inAppPurchasePriceSchedules", method="post", post_data=metadata)
 
-    def get_iap_manual_prices(self, iap_id=None, country_code='IND'):
+    def get_iap_manual_prices(self, iap_id=None, country_code='IND', query=None):
         if not iap_id:
             raise InvalidParameterException(f"'iap_id' is required for listing manual price")
 
-        return self._api_call(f"/v1/inAppPurchasePriceSchedules/"
-                              f"{iap_id}/manualPrices?include=inAppPurchasePricePoint,"
-                              f"territory&filter[territory]={country_code}")
+        if query is None:
+            query = Query().include('inAppPurchasePricePoint', 'territory').filter('territory', country_code)
+
+        return self._api_call(add_query(f"/v1/inAppPurchasePriceSchedules/{iap_id}/manualPrices", query))
 
     def get_iap_review_screenshot_request_status(self, iap_id=None):
         if not iap_id:
@@ -287,6 +682,22 @@ class AppStoreConnect:
             raise InvalidParameterException(f"'iap_id' and 'file_path' are required for creating "
                                             f"screenshot review request")
 
+        metadata = self._iap_review_screenshot_metadata(iap_id, file_path)
+        res = self._api_call(f"/v1/inAppPurchaseAppStoreReviewScreenshots", method="post", post_data=metadata)
+
+        response_json = res.json()
+        creation_id = response_json['data']['id']
+        upload_operations = response_json['data']['attributes']['uploadOperations']
+
+        file_checksum = self.upload_asset(upload_operations, file_path)
+
+        return self._commit_iap_review_screenshot_request(
+            creation_id=creation_id,
+            file_path=file_path,
+            file_checksum=file_checksum
+        )
+
+    def _iap_review_screenshot_metadata(self, iap_id, file_path):
         try:
             file_name = os.path.basename(file_path)
             file_size_in_bytes = os.path.getsize(file_path)
@@ -311,51 +722,35 @@ class AppStoreConnect:
             }
         }
 
-        res = self._api_call(f"/v1/inAppPurchaseAppStoreReviewScreenshots", method="post", post_data=metadata)
-
-        response_json = res.json()
-        creation_id = response_json['data']['id']
-        put_url = response_json['data']['attributes']['uploadOperations'][0]['url']
-
-        _ = self._upload_iap_review_screenshot(
-            put_url=put_url,
-            file_path=file_path
-        )
-
-        return self._commit_iap_review_screenshot_request(
-            creation_id=creation_id,
-            file_path=file_path
-        )
+        return metadata
 
     def _upload_iap_review_screenshot(self, put_url=None, file_path=None):
         if not put_url or not file_path:
             raise InvalidParameterException(f"'put_url' and 'file_path' are required "
                                             f"for uploading screenshot file")
 
-        try:
-            file_handle = open(file_path, 'rb')
-        except Exception as exc:
-            raise exc
+        with open(file_path, 'rb') as file_handle:
+            return self._api_call(
+                put_url,
+                method="put",
+                file_meta={
+                    'content_type': mimetypes.MimeTypes().guess_type(file_path)[0],
+                    'file': file_handle
+                }
+            )
 
-        return self._api_call(
-            put_url,
-            method="put",
-            file_meta={
-                'content_type': mimetypes.MimeTypes().guess_type(file_path)[0],
-                'file': file_handle
-            }
-        )
+    def upload_asset(self, upload_operations=None, file_path=None, max_workers=4):
+        # uploads every part of an asset reservation in parallel and returns the md5
+        # checksum to send when committing the reservation
+        return uploads.AssetUploader(self, max_workers=max_workers).upload(upload_operations, file_path)
 
-    def _commit_iap_review_screenshot_request(self, creation_id=None, file_path=None):
+    def _commit_iap_review_screenshot_request(self, creation_id=None, file_path=None, file_checksum=None):
         if not creation_id or not file_path:
             raise InvalidParameterException(f"'creation_id' and 'file_path' are required for commiting "
                                             f"screenshot review request")
 
-        try:
-            with open(file_path, 'rb') as file:
-                file_checksum = hashlib.md5(file.read()).hexdigest()
-        except Exception as exc:
-            raise exc
+        if not file_checksum:
+            file_checksum = uploads.file_md5(file_path)
 
         metadata = {
             'data': {
@@ -398,15 +793,18 @@ class AppStoreConnect:
 
         return self._api_call(f"/v1/inAppPurchaseSubmissions", method="post", post_data=metadata)
 
-    def list_subscription_groups(self):
-        return self._api_call(f"/v1/apps/{self.app_id}/subscriptionGroups")
+    def list_subscription_groups(self, query=None):
+        return self._api_call(add_query(f"/v1/apps/{self.app_id}/subscriptionGroups", query))
 
-    def get_subscription_group(self, sg_id=None):
+    def iter_subscription_groups(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources(f"/v1/apps/{self.app_id}/subscriptionGroups", limit=limit, query=query)
+
+    def get_subscription_group(self, sg_id=None, query=None):
         if not sg_id:
             raise InvalidParameterException("'sg_id' is mandatory parameter for fetching "
                                             "subscription group info")
 
-        return self._api_call(f"/v1/subscriptionGroups/{sg_id}")
+        return self._api_call(add_query(f"/v1/subscriptionGroups/{sg_id}", query))
 
     def create_subscription_group(self, name=None):
         if not name:
@@ -439,19 +837,102 @@ class AppStoreConnect:
 
         return self._api_call(f"/v1/subscriptionGroups/{sg_id}", method="delete")
 
-    def list_subscription_group_localizations(self, sg_id=None):
+    def list_subscription_group_localizations(self, sg_id=None, query=None):
         if not sg_id:
             raise InvalidParameterException("'sg_id' is mandatory parameter for fetching all "
                                             "localizations for a subscription group")
 
-        return self._api_call(f"/v1/subscriptionGroups/{sg_id}/subscriptionGroupLocalizations")
+        return self._api_call(add_query(f"/v1/subscriptionGroups/{sg_id}/subscriptionGroupLocalizations", query))
 
-    def list_subscriptions_in_a_group(self, sg_id=None):
+    def iter_subscription_group_localizations(self, sg_id=None, limit=50, query=None):
+        if not sg_id:
+            raise InvalidParameterException("'sg_id' is mandatory parameter for fetching all "
+                                            "localizations for a subscription group")
+
+        return self.iter_resources(f"/v1/subscriptionGroups/{sg_id}/subscriptionGroupLocalizations",
+                                   limit=limit, query=query)
+
+    def create_subscription_group_localization(self, sg_id=None, name=None, locale=None, custom_app_name=None):
+        if not sg_id or not name or not locale:
+            raise InvalidParameterException("'sg_id', 'name' and 'locale' are mandatory "
+                                            "parameters for creating localization")
+
+        metadata = {
+            'data': {
+                'type': 'subscriptionGroupLocalizations',
+                'attributes': {
+                    'name': name,
+                    'locale': locale,
+                    'customAppName': custom_app_name
+                },
+                'relationships': {
+                    'subscriptionGroup': {
+                        'data': {
+                            'id': sg_id,
+                            'type': 'subscriptionGroups'
+                        }
+                    }
+                }
+            }
+        }
+
+        return self._api_call(f"/v1/subscriptionGroupLocalizations", method="post", post_data=metadata)
+
+    def update_subscription_group_localization(self, localization_id=None, name=None, custom_app_name=None):
+        if not localization_id:
+            raise InvalidParameterException("'localization_id' is mandatory parameter for updating localization")
+
+        attributes = {name: value for name, value in (('name', name), ('customAppName', custom_app_name))
+                      if value is not None}
+        metadata = {
+            'data': {
+                'id': localization_id,
+                'type': 'subscriptionGroupLocalizations',
+                'attributes': attributes
+            }
+        }
+
+        return self._api_call(f"/v1/subscriptionGroupLocalizations/{localization_id}", method="patch",
+                              post_data=metadata)
+
+    def delete_subscription_group_localization(self, localization_id=None):
+        if not localization_id:
+            raise InvalidParameterException("'localization_id' is mandatory parameter for deleting localization")
+
+        return self._api_call(f"/v1/subscriptionGroupLocalizations/{localization_id}", method="delete")
+
+    def upsert_subscription_group_localizations(self, sg_id=None, localizations=None, delete_missing=False,
+                                                max_workers=4):
+        # localizations: {locale: {'name': .., 'custom_app_name': ..}} or a list of dicts with a 'locale'
+        if not sg_id or localizations is None:
+            raise InvalidParameterException("'sg_id' and 'localizations' are mandatory parameters for "
+                                            "upserting localizations")
+
+        diff = l10n.diff_localizations(self.iter_subscription_group_localizations(sg_id), localizations,
+                                       l10n.SUBSCRIPTION_GROUP_FIELDS, delete_missing)
+        return l10n.apply_diff(
+            diff,
+            lambda locale, attributes: self.create_subscription_group_localization(
+                sg_id, attributes.get('name'), locale, attributes.get('customAppName')),
+            lambda localization_id, attributes: self.update_subscription_group_localization(
+                localization_id, attributes.get('name'), attributes.get('customAppName')),
+            self.delete_subscription_group_localization,
+            max_workers
+        )
+
+    def list_subscriptions_in_a_group(self, sg_id=None, query=None):
         if not sg_id:
             raise InvalidParameterException("'sg_id' is mandatory parameter for fetching all "
                                             "subscriptions inside a group")
 
-        return self._api_call(f"/v1/subscriptionGroups/{sg_id}/subscriptions")
+        return self._api_call(add_query(f"/v1/subscriptionGroups/{sg_id}/subscriptions", query))
+
+    def iter_subscriptions_in_a_group(self, sg_id=None, limit=DEFAULT_PAGE_SIZE, query=None):
+        if not sg_id:
+            raise InvalidParameterException("'sg_id' is mandatory parameter for fetching all "
+                                            "subscriptions inside a group")
+
+        return self.iter_resources(f"/v1/subscriptionGroups/{sg_id}/subscriptions", limit=limit, query=query)
 
     def create_ar_subscription(self, sg_id=None, name=None, product_id=None,
                                subscription_period=None, group_level: int = None, review_note=None):
@@ -491,23 +972,39 @@ class AppStoreConnect:
 
         return self._api_call(f"/v1/subscriptions", method="post", post_data=metadata)
 
-    def list_profiles(self):
-        return self._api_call("/v1/profiles")
+    def list_profiles(self, query=None):
+        return self._api_call(add_query("/v1/profiles", query))
+
+    def iter_profiles(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/profiles", limit=limit, query=query)
 
     def download_profile(self, profileID=None, saveFolderPath=None):
+        r = self._api_call("/v1/profiles/" + profileID)
+        return self._save_profile(r, saveFolderPath)
+
+    def _save_profile(self, r, saveFolderPath=None):
         try:
-            r = self._api_call("/v1/profiles/" + profileID)
             r = r.json()
             attributes = r["data"]["attributes"]
             profileContent = attributes["profileContent"]
             name = attributes["uuid"]
-            saveFilePath = saveFolderPath + "/" + name + ".mobileprovision"
-            f = open(saveFilePath, "w")
-            f.write(base64.b64decode(profileContent))
-            f.close()
+            saveFilePath = os.path.join(saveFolderPath or ".", name + ".mobileprovision")
+            signing.write_atomic(saveFilePath, base64.b64decode(profileContent))
             return "success"
         except FileNotFoundError:
             return "failure"
 
-    def list_users(self):
-        return self._api_call("/v1/userInvitations")
+    def sync_signing_assets(self, directory=None, certificates=True, profiles=True, active_profiles_only=True,
+                            prune=False, max_workers=4):
+        if not directory:
+            raise InvalidParameterException("'directory' is required for syncing certificates and profiles")
+
+        return signing.SigningAssetSync(self, directory, max_workers=max_workers).sync(
+            certificates=certificates, profiles=profiles, active_profiles_only=active_profiles_only, prune=prune)
+
+    def list_users(self, query=None):
+        return self._api_call(add_query("/v1/userInvitations", query))
+
+    def iter_users(self, limit=DEFAULT_PAGE_SIZE, query=None):
+        return self.iter_resources("/v1/userInvitations", limit=limit, query=query)
+
@@ -0,0 +1,401 @@
+import asyncio
+import inspect
+import json
+import time
+
+from .api import AppStoreConnect, BASE_API, mimetypes, requests
+from .coalesce import AsyncSingleFlight
+from .exceptions import *
+from .localizations import IAP_FIELDS, SUBSCRIPTION_GROUP_FIELDS, aapply_diff, diff_localizations
+from .metrics import RequestEvent, emit
+from .pagination import DEFAULT_PAGE_SIZE
+from .query import add_query
+from .reports import CHUNK_SIZE, GzipStreamDecoder, TsvRowParser
+from .resources import Document
+from .uploads import MappedFile, md5_of_buffer, operation_headers, operation_slice
+
+try:
+    import aiohttp
+    from multidict import CIMultiDict
+except ImportError:     # optional dependency, install with `pip install apple-api[async]`
+    aiohttp = None
+
+
+class ApiResponse:
+    # the body is read before the pooled connection is released, so this mirrors the
+    # parts of requests.Response that callers of the sync client rely on
+    def __init__(self, status_code, headers, content, url):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}", response=self)
+
+
+class AsyncAppStoreConnect(AppStoreConnect):
+    # every endpoint inherited from AppStoreConnect returns `self._api_call(...)`, which is a
+    # coroutine here, so `await api.list_apps()` works without redefining the endpoints
+    def __init__(self, key_id, key_file, issuer_id, app_id=None, bundle_id=None,
+                 pool_maxsize=10, max_concurrency=10, keep_alive=True, timeout=None, connector=None,
+                 rate_limiter=None, retry=None, cache=None, hooks=None, base_api=BASE_API, token_store=None,
+                 coalesce=False):
+        if aiohttp is None:
+            raise ImportError("AsyncAppStoreConnect requires aiohttp, install it with "
+                              "`pip install apple-api[async]`")
+
+        super().__init__(key_id, key_file, issuer_id, app_id=app_id, bundle_id=bundle_id,
+                         pool_maxsize=pool_maxsize, keep_alive=keep_alive, timeout=timeout,
+                         rate_limiter=rate_limiter, retry=retry, cache=cache, hooks=hooks, base_api=base_api,
+                         token_store=token_store, coalesce=coalesce)
+        self._flights = AsyncSingleFlight() if coalesce else None
+        self.max_concurrency = max_concurrency
+        self._connector = connector
+        self._client_session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    @property
+    def _session(self):
+        raise MethodNotAllowedException("AsyncAppStoreConnect has no blocking session, use `await` "
+                                        "on the endpoint methods instead")
+
+    def _get_client_session(self):
+        if self._client_session is None:
+            if self._closed:
+                raise MethodNotAllowedException("client has been closed")
+
+            if isinstance(self.timeout, tuple):
+                connect_timeout, read_timeout = self.timeout
+            else:
+                connect_timeout = read_timeout = self.timeout
+
+            connector = self._connector or aiohttp.TCPConnector(limit=self.pool_maxsize,
+                                                                force_close=not self.keep_alive)
+            self._client_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._client_session
+
+    async def aclose(self):
+        self.close()
+        if self._client_session is not None:
+            await self._client_session.close()
+            self._client_session = None
+
+    async def _send(self, method, url, headers, data, stream=False, retry=None):
+        # returns the raw aiohttp response when streaming, an ApiResponse otherwise
+        started = time.perf_counter()
+        try:
+            resp, retries = await self._send_with_retries(method, url, headers, data, retry)
+            r = resp if stream else await self._read_response(resp)
+        except Exception as exc:
+            if self.hooks:
+                self._emit_request(method, url, data, started, error=exc)
+            raise
+
+        if self.hooks:
+            size = int(resp.headers.get('Content-Length') or 0) if stream else len(r.content)
+            self._emit_request(method, url, data, started, resp.status, retries, size=size)
+        return r
+
+    async def _send_with_retries(self, method, url, headers, data, retry=None):
+        # same pacing and retry rules as AppStoreConnect._send_with_retries
+        session = self._get_client_session()
+        limiter = self.rate_limiter if url.startswith(self.base_api) else None
+        retry = retry or self.retry
+        attempt = 0
+        while True:
+            if limiter:
+                delay = limiter.acquire()
+                if delay:
+                    await asyncio.sleep(delay)
+
+            try:
+                resp = await session.request(method.upper(), url, headers=headers, data=data)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not retry or not retry.should_retry_error(method, attempt):
+                    raise
+                delay = retry.backoff(attempt)
+            else:
+                if limiter:
+                    limiter.update(resp.headers)
+                if not retry or not retry.should_retry_response(method, resp.status, attempt):
+                    return resp, attempt
+
+                if resp.status == 429 and limiter:
+                    limiter.exhaust()
+                delay = retry.backoff(attempt, resp.headers.get('Retry-After'))
+                resp.release()
+
+            attempt += 1
+            if hasattr(data, 'seek'):
+                data.seek(0)
+            await asyncio.sleep(delay)
+
+    async def _api_call(self, uri, method="get", post_data=None, file_meta=None, stream=False):
+        method, url, headers, data = self._prepare_request(uri, method, post_data, file_meta)
+        self._get_client_session()
+        if self._flights is None:
+            return await self._request(method, url, headers, data, post_data, stream)
+
+        if method == "get" and not stream:
+            r, shared = await self._flights.do(url, self._request, method, url, headers, data)
+            if shared and self.hooks:
+                self._emit_coalesced(url, r)
+            return r
+
+        try:
+            return await self._request(method, url, headers, data, post_data, stream)
+        finally:
+            if method != "get":
+                self._flights.forget()
+
+    async def _request(self, method, url, headers, data, post_data=None, stream=False):
+        if self.cache and method == "get" and not stream:
+            return await self._cached_api_call(url, headers)
+
+        async with self._semaphore:
+            # when streaming the caller reads the body and releases the connection
+            r = await self._send(method, url, headers, data, stream=stream)
+            if stream:
+                return r
+
+        if self.cache and method != "get" and r.ok:
+            self.cache.invalidate(url, post_data)
+
+        return self._decode_response(r)
+
+    @staticmethod
+    async def _read_response(resp):
+        async with resp:
+            return ApiResponse(resp.status, resp.headers, await resp.read(), str(resp.url))
+
+    async def _cached_api_call(self, url, headers):
+        key = self.cache.key(self.issuer_id, url)
+        entry = self.cache.get(key)
+        if entry and self.cache.is_fresh(entry):
+            if self.hooks:
+                emit(self.hooks, RequestEvent('cache', 'get', self._endpoint(url), url, entry['status_code']))
+            return self._response_from_cache(entry)
+
+        if entry:
+            headers.update(self.cache.conditional_headers(entry))
+
+        async with self._semaphore:
+            r = await self._send("get", url, headers, None)
+
+        if entry and r.status_code == 304:
+            return self._response_from_cache(self.cache.refresh(key, entry))
+
+        if r.status_code == 200 and r.headers.get('content-type') != 'application/a-gzip':
+            self.cache.store(key, url, r.status_code, r.headers, r.content)
+
+        return self._decode_response(r)
+
+    def _response_from_cache(self, entry):
+        return ApiResponse(entry['status_code'], CIMultiDict(entry['headers']), entry['content'], entry['url'])
+
+    async def gather(self, *aws, return_exceptions=False):
+        # accepts coroutines as arguments or a single iterable of them; the number of
+        # requests actually in flight is bounded by `max_concurrency`
+        if len(aws) == 1 and not inspect.isawaitable(aws[0]):
+            aws = tuple(aws[0])
+
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    async def map(self, func, iterable, return_exceptions=False):
+        return await self.gather((func(item) for item in iterable), return_exceptions=return_exceptions)
+
+    async def fetch_document(self, uri, query=None):
+        r = await self._api_call(add_query(uri, query))
+        r.raise_for_status()
+        return Document.from_response(r)
+
+    async def _fetch_page(self, uri):
+        r = await self._api_call(uri)
+        r.raise_for_status()
+        return r.json()
+
+    async def iter_pages(self, uri, limit=DEFAULT_PAGE_SIZE, prefetch=True, query=None):
+        next_uri = add_query(uri, query, limit=limit)
+        task = asyncio.ensure_future(self._fetch_page(next_uri))
+        try:
+            while task is not None:
+                page = await task
+                next_uri = (page.get('links') or {}).get('next')
+                task = None
+                if next_uri:
+                    fetch = self._fetch_page(next_uri)
+                    task = asyncio.ensure_future(fetch) if prefetch else fetch
+
+                yield page
+        finally:
+            if isinstance(task, asyncio.Future):
+                task.cancel()
+            elif task is not None:
+                task.close()
+
+    async def iter_resources(self, uri, limit=DEFAULT_PAGE_SIZE, prefetch=True, query=None):
+        async for page in self.iter_pages(uri, limit=limit, prefetch=prefetch, query=query):
+            for resource in page.get('data') or []:
+                yield resource
+
+    async def iter_report_rows(self, uri):
+        async with await self._api_call(uri, stream=True) as resp:
+            resp.raise_for_status()
+            decoder, parser = GzipStreamDecoder(), TsvRowParser()
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                for row in parser.feed(decoder.decompress(chunk)):
+                    yield row
+
+            for row in parser.feed(decoder.flush()) + parser.close():
+                yield row
+
+    async def download_report(self, uri, file_path, decompress=True):
+        async with await self._api_call(uri, stream=True) as resp:
+            resp.raise_for_status()
+            decoder = GzipStreamDecoder() if decompress else None
+            with open(file_path, 'wb') as file:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    file.write(decoder.decompress(chunk) if decoder else chunk)
+                if decoder:
+                    file.write(decoder.flush())
+
+        return file_path
+
+    async def download_certificate(self, certificatID=None, saveFolderPath=None):
+        r = await self._api_call("/v1/certificates/" + certificatID)
+        return self._save_certificate(r, saveFolderPath)
+
+    async def download_profile(self, profileID=None, saveFolderPath=None):
+        r = await self._api_call("/v1/profiles/" + profileID)
+        return self._save_profile(r, saveFolderPath)
+
+    async def upsert_iap_purchase_localizations(self, iap_id=None, localizations=None, delete_missing=False):
+        if not iap_id or localizations is None:
+            raise InvalidParameterException("'iap_id' and 'localizations' are mandatory parameters for "
+                                            "upserting localizations")
+
+        existing = [resource async for resource in self.iter_iap_purchase_localizations(iap_id)]
+        diff = diff_localizations(existing, localizations, IAP_FIELDS, delete_missing)
+        return await aapply_diff(
+            diff,
+            lambda locale, attributes: self.create_iap_purchase_localization(
+                iap_id, attributes.get('name'), locale, attributes.get('description')),
+            lambda localization_id, attributes: self.update_iap_purchase_localization(
+                localization_id, attributes.get('name'), attributes.get('description')),
+            self.delete_iap_purchase_localization
+        )
+
+    async def upsert_subscription_group_localizations(self, sg_id=None, localizations=None, delete_missing=False):
+        if not sg_id or localizations is None:
+            raise InvalidParameterException("'sg_id' and 'localizations' are mandatory parameters for "
+                                            "upserting localizations")
+
+        existing = [resource async for resource in self.iter_subscription_group_localizations(sg_id)]
+        diff = diff_localizations(existing, localizations, SUBSCRIPTION_GROUP_FIELDS, delete_missing)
+        return await aapply_diff(
+            diff,
+            lambda locale, attributes: self.create_subscription_group_localization(
+                sg_id, attributes.get('name'), locale, attributes.get('customAppName')),
+            lambda localization_id, attributes: self.update_subscription_group_localization(
+                localization_id, attributes.get('name'), attributes.get('customAppName')),
+            self.delete_subscription_group_localization
+        )
+
+    async def sync_signing_assets(self, *args, **kwargs):
+        raise MethodNotAllowedException("sync_signing_assets needs a blocking client, use "
+                                        "SigningAssetSync with an AppStoreConnect instance")
+
+    async def create_iap_review_screenshot_request(self, iap_id=None, file_path=None):
+        if not iap_id or not file_path:
+            raise InvalidParameterException(f"'iap_id' and 'file_path' are required for creating "
+                                            f"screenshot review request")
+
+        metadata = self._iap_review_screenshot_metadata(iap_id, file_path)
+        res = await self._api_call(f"/v1/inAppPurchaseAppStoreReviewScreenshots", method="post",
+                                   post_data=metadata)
+
+        response_json = res.json()
+        creation_id = response_json['data']['id']
+        upload_operations = response_json['data']['attributes']['uploadOperations']
+
+        file_checksum = await self.upload_asset(upload_operations, file_path)
+
+        return await self._commit_iap_review_screenshot_request(
+            creation_id=creation_id,
+            file_path=file_path,
+            file_checksum=file_checksum
+        )
+
+    async def _upload_iap_review_screenshot(self, put_url=None, file_path=None):
+        if not put_url or not file_path:
+            raise InvalidParameterException(f"'put_url' and 'file_path' are required "
+                                            f"for uploading screenshot file")
+
+        with open(file_path, 'rb') as file_handle:
+            return await self._api_call(
+                put_url,
+                method="put",
+                file_meta={
+                    'content_type': mimetypes.MimeTypes().guess_type(file_path)[0],
+                    'file': file_handle
+                }
+            )
+
+    async def upload_asset(self, upload_operations=None, file_path=None, max_workers=4):
+        if not upload_operations or not file_path:
+            raise InvalidParameterException("'upload_operations' and 'file_path' are required for "
+                                            "uploading an asset")
+
+        limit = asyncio.Semaphore(max_workers)
+        with MappedFile(file_path) as mapped:
+            parts = [operation_slice(mapped.view, operation) for operation in upload_operations]
+            # the checksum is computed on a worker thread while the parts are in flight
+            checksum = asyncio.get_running_loop().run_in_executor(None, md5_of_buffer, mapped.view)
+            try:
+                results = await asyncio.gather(
+                    *(self._upload_part(operation, part, limit) for operation, part in zip(upload_operations, parts)),
+                    return_exceptions=True
+                )
+            finally:
+                file_checksum = await checksum
+                for part in parts:
+                    part.release()
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        return file_checksum
+
+    async def _upload_part(self, operation, part, limit):
+        async with limit:
+            r = await self._send(operation.get('method', 'PUT').lower(), operation['url'],
+                                 operation_headers(operation), part)
+
+        if not r.ok:
+            raise UploadFailedException(f"upload of {len(part)} bytes at offset {operation.get('offset') or 0} "
+                                        f"failed with status {r.status_code}")
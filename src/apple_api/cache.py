@@ -0,0 +1,200 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .lazy import LazyModule
+
+sqlite3 = LazyModule('sqlite3')  # only SQLiteBackend needs it
+
+_ID_SEGMENT = 3     # /v1/{type}/{id}/...
+
+DEFAULT_TTLS = {
+    '/v1/apps': 3600,
+    '/v1/bundleIds': 3600,
+    '/v1/certificates': 3600,
+    '/v1/profiles': 3600,
+    '/v1/apps/{id}/subscriptionGroups': 600,
+    '/v2/inAppPurchases/{id}/pricePoints': 86400,
+}
+
+
+def endpoint_template(url):
+    # '/v2/inAppPurchases/6444/pricePoints?include=territory' -> '/v2/inAppPurchases/{id}/pricePoints'
+    segments = urlsplit(url).path.split('/')
+    if len(segments) > _ID_SEGMENT and segments[_ID_SEGMENT]:
+        segments[_ID_SEGMENT] = '{id}'
+
+    return '/'.join(segments)
+
+
+def mutated_targets(url, post_data=None):
+    # resource types and ids touched by a POST/PATCH/DELETE, cached GETs mentioning any
+    # of them in their path are dropped
+    segments = urlsplit(url).path.split('/')
+    types = set(segments[2:3])
+    ids = set(segments[_ID_SEGMENT:_ID_SEGMENT + 1])
+
+    data = (post_data or {}).get('data') if isinstance(post_data, dict) else None
+    if isinstance(data, dict):
+        types.add(data.get('type'))
+        ids.add(data.get('id'))
+        for relationship in (data.get('relationships') or {}).values():
+            related = (relationship or {}).get('data')
+            for item in related if isinstance(related, list) else [related]:
+                if isinstance(item, dict):
+                    ids.add(item.get('id'))
+
+    return {value for value in types if value}, {value for value in ids if value and '$' not in value}
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous['content'])
+
+            self._entries[key] = entry
+            self._size += len(entry['content'])
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted['content'])
+
+    def invalidate(self, types, ids):
+        markers = tuple('/' + value for value in types | ids)
+        with self._lock:
+            for key in [key for key in self._entries if _mentions(key, markers)]:
+                self._size -= len(self._entries.pop(key)['content'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class SQLiteBackend:
+    # on-disk backend, several worker processes can point at the same file
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, entry TEXT NOT NULL, "
+                         "content BLOB NOT NULL, last_access REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT entry, content FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+
+        entry = json.loads(row[0])
+        entry['content'] = bytes(row[1])
+        return entry
+
+    def set(self, key, entry):
+        meta = json.dumps({name: value for name, value in entry.items() if name != 'content'})
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses (key, entry, content, last_access) VALUES (?, ?, ?, ?)",
+                             (key, meta, entry['content'], time.time()))
+            self._db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                             "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def invalidate(self, types, ids):
+        markers = tuple('/' + value for value in types | ids)
+        with self._lock:
+            keys = [key for key, in self._db.execute("SELECT key FROM responses") if _mentions(key, markers)]
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def close(self):
+        self._db.close()
+
+
+def _mentions(key, markers):
+    path = key.split('?', 1)[0]
+    return any(re.search(re.escape(marker) + r'(/|$|V\d)', path) for marker in markers)
+
+
+class ResponseCache:
+    # opt-in cache for GET responses, keyed on the issuer and the normalized url. Entries
+    # outlive their ttl so they can be revalidated with If-None-Match/If-Modified-Since
+    # until the LRU evicts them
+    def __init__(self, backend=None, default_ttl=300, ttls=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.default_ttl = default_ttl
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+
+    def key(self, namespace, url):
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return f"{namespace}:{parts.path}?{query}"
+
+    def ttl(self, url):
+        return self.ttls.get(endpoint_template(url), self.default_ttl)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry['expires_at'] > time.time()
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
+
+    def store(self, key, url, status_code, headers, content):
+        ttl = self.ttl(url)
+        if ttl <= 0:
+            return
+
+        kept = ('Content-Type', 'ETag', 'Last-Modified', 'X-Rate-Limit')
+        self.backend.set(key, {
+            'url': url,
+            'status_code': status_code,
+            'headers': {name: headers[name] for name in kept if headers.get(name)},
+            'content': content,
+            'expires_at': time.time() + ttl,
+        })
+
+    def refresh(self, key, entry):
+        entry = dict(entry, expires_at=time.time() + self.ttl(entry['url']))
+        self.backend.set(key, entry)
+        return entry
+
+    def invalidate(self, url, post_data=None):
+        types, ids = mutated_targets(url, post_data)
+        if types or ids:
+            self.backend.invalidate(types, ids)
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,80 @@
+import threading
+
+from .lazy import LazyModule
+
+asyncio = LazyModule('asyncio')  # only needed by AsyncSingleFlight
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    # runs one call per key at a time; callers asking for a key that is already in flight
+    # wait for it and share its result (or exception) instead of repeating the request
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        # returns (result, shared), shared is True when the result came from another caller
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args)
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+
+        return call.result, False
+
+    def forget(self):
+        # calls already in flight finish for their current waiters, new callers start fresh
+        # ones; used after writes so a read never joins a request sent before the write
+        with self._lock:
+            self._calls = {}
+
+
+class AsyncSingleFlight:
+    # asyncio counterpart of SingleFlight. The call runs as its own task, so cancelling the
+    # caller that started it does not cancel the request for the others waiting on it
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args):
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda done: self._done(key, done))
+
+        return await asyncio.shield(task), shared
+
+    def _done(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an unshared failure is not reported twice
+
+    def forget(self):
+        self._calls = {}
@@ -3,3 +3,6 @@ class MethodNotAllowedException(BaseException):
 
 class InvalidParameterException(BaseException):
     pass
+
+class UploadFailedException(BaseException):
+    pass
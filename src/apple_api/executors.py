@@ -0,0 +1,30 @@
+import contextvars
+
+from .lazy import LazyModule
+
+futures = LazyModule('concurrent.futures')  # only loaded by the first pool that is created
+
+
+class ThreadPool:
+    # ThreadPoolExecutor whose tasks run in a copy of the submitting thread's context, so
+    # state kept in context variables, e.g. a ClientPool.pinned() block, reaches the workers
+    # of page prefetching, fan-outs and syncs. submit() returns a regular Future
+    def __init__(self, max_workers):
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def submit(self, fn, *args):
+        return self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def map(self, fn, iterable):
+        # every task is submitted up front, results are yielded in order
+        submitted = [self.submit(fn, item) for item in iterable]
+        return (future.result() for future in submitted)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
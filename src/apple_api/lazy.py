@@ -0,0 +1,21 @@
+import importlib
+
+
+class LazyModule:
+    # stands in for a module that is only imported on first attribute access, so importing
+    # apple_api stays cheap for processes that never send a request. Submodules are named
+    # in full, e.g. LazyModule('jwt.algorithms')
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<LazyModule {self._name} ({'loaded' if self._module else 'not loaded'})>"
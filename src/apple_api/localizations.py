@@ -0,0 +1,127 @@
+from .exceptions import *
+from .executors import ThreadPool
+from .lazy import LazyModule
+
+asyncio = LazyModule('asyncio')  # only needed by aapply_diff
+
+# accepted keys of a desired localization -> API attribute
+IAP_FIELDS = {'name': 'name', 'description': 'description'}
+SUBSCRIPTION_GROUP_FIELDS = {'name': 'name', 'custom_app_name': 'customAppName', 'customAppName': 'customAppName'}
+
+
+class LocalizationDiff:
+    __slots__ = ('create', 'update', 'delete', 'unchanged')
+
+    def __init__(self):
+        self.create = []  # (locale, attributes)
+        self.update = []  # (localization id, locale, changed attributes)
+        self.delete = []  # (localization id, locale)
+        self.unchanged = []  # locales
+
+    def __repr__(self):
+        return (f"<LocalizationDiff create={len(self.create)} update={len(self.update)} "
+                f"delete={len(self.delete)} unchanged={len(self.unchanged)}>")
+
+    def __bool__(self):
+        return bool(self.create or self.update or self.delete)
+
+
+def _desired(localizations, fields):
+    # {locale: {attribute: value}} from a dict keyed by locale or a list of dicts with a 'locale'
+    if isinstance(localizations, dict):
+        localizations = [dict(values, locale=locale) for locale, values in localizations.items()]
+
+    desired = {}
+    for localization in localizations:
+        locale = localization.get('locale')
+        if not locale:
+            raise InvalidParameterException("'locale' is mandatory for every localization")
+        if locale in desired:
+            raise InvalidParameterException(f"localization '{locale}' is given more than once")
+        # None means "not given": the update endpoints cannot clear an attribute
+        desired[locale] = {fields[key]: value for key, value in localization.items()
+                           if key in fields and value is not None}
+    return desired
+
+
+def diff_localizations(existing, localizations, fields, delete_missing=False):
+    # attributes left out of a desired localization (or given as None) are not compared, so
+    # they keep their current value. Existing locales missing from the desired set are only
+    # deleted with `delete_missing`
+    desired = _desired(localizations, fields)
+    diff = LocalizationDiff()
+    seen = set()
+    for resource in existing:
+        attributes = resource['attributes']
+        locale = attributes.get('locale')
+        if locale not in desired:
+            if delete_missing:
+                diff.delete.append((resource['id'], locale))
+            continue
+
+        seen.add(locale)
+        changed = {name: value for name, value in desired[locale].items() if attributes.get(name) != value}
+        if changed:
+            diff.update.append((resource['id'], locale, changed))
+        else:
+            diff.unchanged.append(locale)
+
+    for locale, attributes in desired.items():
+        if locale not in seen:
+            diff.create.append((locale, attributes))
+    return diff
+
+
+def _checked(r):
+    r.raise_for_status()
+    return r
+
+
+def _calls(diff, create, update, delete):
+    calls = [('created', locale, create, (locale, attributes)) for locale, attributes in diff.create]
+    calls += [('updated', locale, update, (localization_id, attributes))
+              for localization_id, locale, attributes in diff.update]
+    calls += [('deleted', locale, delete, (localization_id,)) for localization_id, locale in diff.delete]
+    return calls
+
+
+def _summary(diff, outcomes):
+    summary = {'created': [], 'updated': [], 'deleted': [], 'unchanged': list(diff.unchanged), 'failed': {}}
+    for outcome, locale, exc in outcomes:
+        if exc is None:
+            summary[outcome].append(locale)
+        else:
+            summary['failed'][locale] = exc
+    return summary
+
+
+def apply_diff(diff, create, update, delete, max_workers=4):
+    # sends the writes of a diff in parallel, returns
+    # {'created': [...], 'updated': [...], 'deleted': [...], 'unchanged': [...], 'failed': {locale: exception}}
+    calls = _calls(diff, create, update, delete)
+    if not calls:
+        return _summary(diff, [])
+
+    def send(call):
+        outcome, locale, func, args = call
+        try:
+            _checked(func(*args))
+        except (Exception, InvalidParameterException) as exc:
+            return outcome, locale, exc
+        return outcome, locale, None
+
+    with ThreadPool(max_workers=min(max_workers, len(calls))) as executor:
+        return _summary(diff, executor.map(send, calls))
+
+
+async def aapply_diff(diff, create, update, delete):
+    # apply_diff() for AsyncAppStoreConnect, concurrency is bounded by the client
+    async def send(call):
+        outcome, locale, func, args = call
+        try:
+            _checked(await func(*args))
+        except (Exception, InvalidParameterException) as exc:
+            return outcome, locale, exc
+        return outcome, locale, None
+
+    return _summary(diff, await asyncio.gather(*map(send, _calls(diff, create, update, delete))))
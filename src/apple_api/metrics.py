@@ -0,0 +1,184 @@
+import os
+import threading
+import warnings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class RequestEvent:
+    # one per logical request (retries included), or per token refresh when kind == 'token'.
+    # GETs answered by the response cache are 'cache' events, GETs that shared another
+    # caller's in-flight request 'coalesced' ones.
+    # `endpoint` is the url path with ids replaced by {id}, uploads are reported by host
+    __slots__ = ('kind', 'method', 'endpoint', 'url', 'status_code', 'latency', 'bytes_sent',
+                 'bytes_received', 'retries', 'rate_limit_remaining', 'error')
+
+    def __init__(self, kind, method=None, endpoint=None, url=None, status_code=None, latency=0.0,
+                 bytes_sent=0, bytes_received=0, retries=0, rate_limit_remaining=None, error=None):
+        self.kind = kind
+        self.method = method
+        self.endpoint = endpoint
+        self.url = url
+        self.status_code = status_code
+        self.latency = latency
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.retries = retries
+        self.rate_limit_remaining = rate_limit_remaining
+        self.error = error
+
+    def __repr__(self):
+        return (f"<RequestEvent {self.kind} {self.method} {self.endpoint} {self.status_code} "
+                f"{self.latency * 1000:.1f}ms>")
+
+
+def body_size(data):
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, memoryview):
+        return data.nbytes
+    if hasattr(data, '__len__'):
+        return len(data)
+    if hasattr(data, 'fileno'):
+        try:
+            return os.fstat(data.fileno()).st_size
+        except OSError:
+            return 0
+    return 0
+
+
+def emit(hooks, event):
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as exc:     # instrumentation must never fail a request
+            warnings.warn(f"request hook {hook!r} raised {exc!r}")
+
+
+class _Series:
+    __slots__ = ('count', 'buckets', 'latency_sum', 'bytes_sent', 'bytes_received', 'retries', 'statuses')
+
+    def __init__(self):
+        self.count = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.statuses = {}
+
+    def add(self, event):
+        self.count += 1
+        self.latency_sum += event.latency
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if event.latency <= bound:
+                self.buckets[position] += 1
+                break
+        self.bytes_sent += event.bytes_sent or 0
+        self.bytes_received += event.bytes_received or 0
+        self.retries += event.retries or 0
+        status = str(event.status_code) if event.status_code is not None else 'error'
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def percentile(self, fraction):
+        # upper bound of the bucket holding the given fraction of requests
+        target = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS[position]
+        return float('inf') if self.count else None
+
+
+class MetricsCollector:
+    # request hook aggregating events per (kind, method, endpoint); register it with
+    # `api.add_hook(collector)` and read it back with snapshot() or to_prometheus()
+    def __init__(self, prefix='appstoreconnect'):
+        self.prefix = prefix
+        self.rate_limit_remaining = None
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        key = (event.kind, event.method or '', event.endpoint or '')
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(event)
+            if event.rate_limit_remaining is not None:
+                self.rate_limit_remaining = event.rate_limit_remaining
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'rate_limit_remaining': self.rate_limit_remaining,
+                'endpoints': [{
+                    'kind': kind,
+                    'method': method,
+                    'endpoint': endpoint,
+                    'count': series.count,
+                    'latency_sum': series.latency_sum,
+                    'latency_p50': series.percentile(0.5),
+                    'latency_p99': series.percentile(0.99),
+                    'bytes_sent': series.bytes_sent,
+                    'bytes_received': series.bytes_received,
+                    'retries': series.retries,
+                    'statuses': dict(series.statuses),
+                } for (kind, method, endpoint), series in sorted(self._series.items())],
+            }
+
+    def export(self, callback, reset=False):
+        snapshot = self.snapshot()
+        if reset:
+            self.reset()
+        callback(snapshot)
+        return snapshot
+
+    def to_prometheus(self):
+        name = self.prefix
+        lines = [
+            f"# HELP {name}_request_duration_seconds Request latency including retries",
+            f"# TYPE {name}_request_duration_seconds histogram",
+        ]
+        counters = []
+        with self._lock:
+            for (kind, method, endpoint), series in sorted(self._series.items()):
+                labels = f'kind="{kind}",method="{method}",endpoint="{_escape(endpoint)}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, series.buckets):
+                    cumulative += count
+                    lines.append(f'{name}_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series.count}')
+                lines.append(f'{name}_request_duration_seconds_sum{{{labels}}} {series.latency_sum}')
+                lines.append(f'{name}_request_duration_seconds_count{{{labels}}} {series.count}')
+
+                counters.append(('request_bytes_sent_total', labels, series.bytes_sent))
+                counters.append(('response_bytes_received_total', labels, series.bytes_received))
+                counters.append(('request_retries_total', labels, series.retries))
+                for status, count in sorted(series.statuses.items()):
+                    counters.append(('responses_total', f'{labels},status="{status}"', count))
+            rate_limit_remaining = self.rate_limit_remaining
+
+        for metric in ('request_bytes_sent_total', 'response_bytes_received_total', 'request_retries_total',
+                       'responses_total'):
+            lines.append(f"# TYPE {name}_{metric} counter")
+            lines.extend(f'{name}_{metric}{{{labels}}} {value}' for counter, labels, value in counters
+                         if counter == metric)
+
+        if rate_limit_remaining is not None:
+            lines.append(f"# TYPE {name}_rate_limit_remaining gauge")
+            lines.append(f"{name}_rate_limit_remaining {rate_limit_remaining}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
@@ -0,0 +1,251 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .executors import ThreadPool
+from .query import Query
+from .resources import Resource, loads
+
+BUILD_OVERLAP = timedelta(hours=6)  # builds uploaded shortly before the last sync are fetched again
+ID_BATCH = 50  # ids per filter[id] request
+WRITE_BATCH = 1000  # builds per transaction of a build sync
+
+
+def _uploaded(build):
+    value = (build.get('attributes') or {}).get('uploadedDate')
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
+
+
+class CatalogMirror:
+    # keeps apps, builds, in-app purchases, subscription groups and subscriptions in a local
+    # SQLite database so dashboards read them without spending API quota, e.g.
+    #   mirror.sync()
+    #   for build in mirror.builds(app_id, processing_state='VALID'): ...
+    # Builds are synced incrementally: new uploads are read newest first until the previous
+    # sync's newest build and builds still processing are refetched by id. The other
+    # collections have no modification filter in the API and are refetched in full once they
+    # are older than `max_age`, resources that disappeared are removed
+    def __init__(self, client, path, max_workers=4):
+        self.client = client
+        self.path = path
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS resources (type TEXT, id TEXT, parent_id TEXT, attributes TEXT, "
+            "relationships TEXT, synced_at REAL, PRIMARY KEY (type, id));"
+            "CREATE INDEX IF NOT EXISTS resources_parent ON resources (type, parent_id);"
+            "CREATE TABLE IF NOT EXISTS relationships (type TEXT, id TEXT, name TEXT, related_type TEXT, "
+            "related_id TEXT, PRIMARY KEY (type, id, name, related_type, related_id));"
+            "CREATE INDEX IF NOT EXISTS relationships_related ON relationships (related_type, related_id, name);"
+            "CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, synced_at REAL, watermark TEXT);"
+        )
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -- sync
+
+    def sync(self, max_age=3600, full=False):
+        # returns the number of resources written per collection
+        stats = {}
+        now = time.time()
+        if full or self._is_stale('apps', max_age, now):
+            stats['apps'] = self._replace('apps', None, self.client.iter_apps(), now)
+
+        app_ids = [resource.id for resource in self.apps()]
+        stats['inAppPurchases'] = self._sync_children(
+            'inAppPurchases', app_ids, lambda app_id: self.client.iter_in_app_purchases(app_id), max_age, full, now)
+        stats['subscriptionGroups'] = self._sync_children(
+            'subscriptionGroups', app_ids,
+            lambda app_id: self.client.iter_resources(f"/v1/apps/{app_id}/subscriptionGroups"), max_age, full, now)
+
+        group_ids = [resource.id for resource in self._select('subscriptionGroups')]
+        stats['subscriptions'] = self._sync_children(
+            'subscriptions', group_ids, lambda sg_id: self.client.iter_subscriptions_in_a_group(sg_id),
+            max_age, full, now)
+
+        stats['builds'] = self.sync_builds(full=full)
+        return stats
+
+    def sync_builds(self, full=False):
+        # builds are written in batches as they arrive, so memory stays flat on a full sync and
+        # an interrupted sync keeps what it wrote; the watermark only moves once all are written
+        state = self._state('builds')
+        watermark = datetime.fromisoformat(state[1]) if state and state[1] and not full else None
+        query = Query().sort('-uploadedDate').include('app').fields('apps', 'bundleId')
+
+        now = time.time()
+        written, newest, batch = 0, None, []
+        for build in self.client.iter_builds(query=query):
+            uploaded = _uploaded(build)
+            if uploaded and (newest is None or uploaded > newest):
+                newest = uploaded
+            if watermark and uploaded and uploaded < watermark - BUILD_OVERLAP:
+                break
+            batch.append(build)
+            if len(batch) >= WRITE_BATCH:
+                written += self._write_batch(batch, now)
+                batch = []
+        written += self._write_batch(batch, now)
+
+        # processing state is the attribute that changes after upload, builds still processing
+        # that were not part of this sync are refetched by id
+        with self._lock:
+            processing = [row[0] for row in self._db.execute(
+                "SELECT id FROM resources WHERE type = 'builds' AND synced_at < ? "
+                "AND json_extract(attributes, '$.processingState') = 'PROCESSING'", (now,)
+            )]
+        for start in range(0, len(processing), ID_BATCH):
+            query = Query().filter('id', processing[start:start + ID_BATCH]).include('app').fields('apps', 'bundleId')
+            written += self._write_batch(list(self.client.iter_builds(query=query)), now)
+
+        with self._lock, self._db:
+            if watermark and (newest is None or watermark > newest):
+                newest = watermark
+            self._set_state('builds', now, newest.isoformat() if newest else None)
+        return written
+
+    def _write_batch(self, resources, now):
+        if resources:
+            with self._lock, self._db:
+                self._write(resources, None, now)
+        return len(resources)
+
+    def _sync_children(self, collection, parent_ids, fetch, max_age, full, now):
+        stale = [parent_id for parent_id in parent_ids
+                 if full or self._is_stale(f"{collection}:{parent_id}", max_age, now)]
+        if not stale:
+            return 0
+
+        def load(parent_id):
+            return parent_id, list(fetch(parent_id))
+
+        written = 0
+        with ThreadPool(max_workers=self.max_workers) as executor:
+            for parent_id, resources in executor.map(load, stale):
+                written += self._replace(collection, parent_id, resources, now)
+        return written
+
+    def _replace(self, collection, parent_id, resources, now):
+        # writes a complete listing and drops resources of the same parent that are gone
+        resources = list(resources)
+        state_key = f"{collection}:{parent_id}" if parent_id else collection
+        with self._lock, self._db:
+            self._write(resources, parent_id, now)
+            types = {resource['type'] for resource in resources} or {collection}
+            for resource_type in types:
+                stale = [row[0] for row in self._db.execute(
+                    "SELECT id FROM resources WHERE type = ? AND parent_id IS ? AND synced_at < ?",
+                    (resource_type, parent_id, now)
+                )]
+                for start in range(0, len(stale), 500):
+                    batch = stale[start:start + 500]
+                    marks = ', '.join('?' * len(batch))
+                    self._db.execute(f"DELETE FROM resources WHERE type = ? AND id IN ({marks})",
+                                     (resource_type, *batch))
+                    self._db.execute(f"DELETE FROM relationships WHERE type = ? AND id IN ({marks})",
+                                     (resource_type, *batch))
+            self._set_state(state_key, now, None)
+        return len(resources)
+
+    def _write(self, resources, parent_id, now):
+        rows, links, ids = [], [], []
+        for resource in resources:
+            relationships = {}
+            for name, relationship in (resource.get('relationships') or {}).items():
+                data = relationship.get('data')
+                if data is None:
+                    continue
+                relationships[name] = {'data': data}
+                for item in data if isinstance(data, list) else [data]:
+                    links.append((resource['type'], resource['id'], name, item['type'], item['id']))
+
+            # builds carry their app as a relationship, nested listings their parent id
+            owner = parent_id
+            if owner is None and 'app' in relationships and isinstance(relationships['app']['data'], dict):
+                owner = relationships['app']['data']['id']
+            ids.append((resource['type'], resource['id']))
+            rows.append((resource['type'], resource['id'], owner, json.dumps(resource.get('attributes') or {}),
+                         json.dumps(relationships), now))
+
+        self._db.executemany("DELETE FROM relationships WHERE type = ? AND id = ?", ids)
+        self._db.executemany("INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._db.executemany("INSERT OR IGNORE INTO relationships VALUES (?, ?, ?, ?, ?)", links)
+
+    def _state(self, collection):
+        with self._lock:
+            return self._db.execute("SELECT synced_at, watermark FROM sync_state WHERE collection = ?",
+                                    (collection,)).fetchone()
+
+    def _set_state(self, collection, synced_at, watermark):
+        self._db.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (collection, synced_at, watermark))
+
+    def _is_stale(self, collection, max_age, now):
+        state = self._state(collection)
+        return state is None or max_age is None or now - state[0] >= max_age
+
+    # -- reads
+
+    def _resource(self, row):
+        return Resource({'type': row[0], 'id': row[1], 'attributes': loads(row[2]),
+                         'relationships': loads(row[3])})
+
+    def _select(self, resource_type, parent_id=None, where='', parameters=()):
+        sql = "SELECT type, id, attributes, relationships FROM resources WHERE type = ?"
+        values = [resource_type]
+        if parent_id is not None:
+            sql += " AND parent_id = ?"
+            values.append(parent_id)
+        values.extend(parameters)
+        with self._lock:
+            rows = self._db.execute(sql + where, values).fetchall()
+        return [self._resource(row) for row in rows]
+
+    def get(self, resource_type, resource_id):
+        with self._lock:
+            row = self._db.execute("SELECT type, id, attributes, relationships FROM resources "
+                                   "WHERE type = ? AND id = ?", (resource_type, resource_id)).fetchone()
+        return self._resource(row) if row else None
+
+    def find(self, resource_type, **attributes):
+        # equality match on attributes, e.g. mirror.find('apps', bundleId='com.example.app')
+        where = ''.join(f" AND json_extract(attributes, '$.{name}') = ?" for name in attributes)
+        return self._select(resource_type, where=where, parameters=attributes.values())
+
+    def related(self, resource_type, resource_id, name):
+        # resources pointing at the given one, e.g. related('apps', app_id, 'app') lists its builds
+        with self._lock:
+            keys = self._db.execute("SELECT type, id FROM relationships WHERE related_type = ? AND related_id = ? "
+                                    "AND name = ?", (resource_type, resource_id, name)).fetchall()
+        return [resource for resource in (self.get(*key) for key in keys) if resource]
+
+    def apps(self):
+        return self._select('apps')
+
+    def builds(self, app_id=None, processing_state=None):
+        if processing_state is None:
+            return self._select('builds', app_id)
+        return self._select('builds', app_id, " AND json_extract(attributes, '$.processingState') = ?",
+                            (processing_state,))
+
+    def in_app_purchases(self, app_id=None):
+        return self._select('inAppPurchases', app_id)
+
+    def subscription_groups(self, app_id=None):
+        return self._select('subscriptionGroups', app_id)
+
+    def subscriptions(self, sg_id=None):
+        return self._select('subscriptions', sg_id)
@@ -0,0 +1,29 @@
+from .executors import ThreadPool
+
+DEFAULT_PAGE_SIZE = 200     # maximum page size accepted by most list endpoints
+
+
+def iter_pages(fetch_page, uri, prefetch=True):
+    # `fetch_page` turns a uri into a decoded JSON:API document. While the caller works
+    # through one page the next one is requested in the background, so at most two
+    # pages are held in memory at any time
+    executor = ThreadPool(max_workers=1) if prefetch else None
+    try:
+        page = fetch_page(uri)
+        while page is not None:
+            next_uri = (page.get('links') or {}).get('next')
+            future = executor.submit(fetch_page, next_uri) if executor and next_uri else None
+
+            yield page
+
+            if not next_uri:
+                break
+            page = future.result() if future else fetch_page(next_uri)
+    finally:
+        if executor:
+            executor.shutdown(wait=False)
+
+
+def iter_resources(fetch_page, uri, prefetch=True):
+    for page in iter_pages(fetch_page, uri, prefetch=prefetch):
+        yield from page.get('data') or []
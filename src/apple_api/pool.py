@@ -0,0 +1,142 @@
+import contextvars
+import itertools
+from contextlib import contextmanager
+
+from .api import AppStoreConnect, BASE_API
+from .exceptions import *
+
+WRITE_METHODS = ('post', 'patch', 'put', 'delete')
+
+
+class ClientPool(AppStoreConnect):
+    # spreads requests over several API keys, each with its own token and rate limit budget.
+    # Every endpoint of AppStoreConnect is available; a request goes to the key with the most
+    # quota left unless it is pinned to a key (or to a team by its issuer id) with `pinned()`.
+    # Writes go to `write_key_id` when one is given, unless they are pinned to another key or
+    # team. Keys from several teams only see their own team's resources, pin requests to the
+    # right issuer when mixing teams
+    def __init__(self, keys, app_id=None, bundle_id=None, write_key_id=None, pool_connections=10,
+                 pool_maxsize=10, adapter=None, cache=None, hooks=None, base_api=BASE_API, coalesce=False,
+                 **options):
+        if not keys:
+            raise InvalidParameterException("'keys' must contain at least one api key")
+
+        # the pool has no key of its own, it only routes; sockets are shared by every key and
+        # the Authorization header is set per request by the member client that sends it
+        super().__init__(None, None, None, app_id=app_id, bundle_id=bundle_id, pool_connections=pool_connections,
+                         pool_maxsize=pool_maxsize, adapter=adapter, rate_limiter=False, retry=False, cache=cache,
+                         hooks=hooks, base_api=base_api, coalesce=coalesce)
+        # identical GETs are merged by the pool before a key is chosen, so they never run once per key
+        self.clients = [self._client(key, dict(options, coalesce=coalesce)) for key in keys]
+        self._by_key_id = {client.key_id: client for client in self.clients}
+        if write_key_id is not None and write_key_id not in self._by_key_id:
+            raise InvalidParameterException(f"'write_key_id' {write_key_id} is not one of the pool's keys")
+
+        self.write_key_id = write_key_id
+        self._counter = itertools.count()
+        # a context variable so the pin follows the work into the package's worker threads
+        self._pin = contextvars.ContextVar(f'apple_api_pool_pin_{id(self)}', default=None)
+
+    def _client(self, key, options):
+        if isinstance(key, AppStoreConnect):
+            client = key
+        else:
+            if isinstance(key, dict):
+                key_id, key_file, issuer_id = key['key_id'], key['key_file'], key['issuer_id']
+            else:
+                key_id, key_file, issuer_id = key
+            client = AppStoreConnect(key_id, key_file, issuer_id, app_id=self.app_id, bundle_id=self.bundle_id,
+                                     adapter=self.adapter, cache=self.cache, base_api=self.base_api, **options)
+
+        client.hooks = self.hooks  # shared, so add_hook() on the pool reaches every key
+        return client
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        super().close()
+
+    @property
+    def _debug(self):
+        return any(client._debug for client in getattr(self, 'clients', ()))
+
+    @_debug.setter
+    def _debug(self, value):
+        # requests are prepared by the member clients
+        for client in getattr(self, 'clients', ()):
+            client._debug = value
+
+    @property
+    def budgets(self):
+        return {client.key_id: client.rate_limiter.budget if client.rate_limiter else None
+                for client in self.clients}
+
+    @contextmanager
+    def pinned(self, key_id=None, issuer_id=None):
+        # routes every request made inside the block to one key, or to the keys of one team,
+        # including the requests the package sends from worker threads on the block's behalf
+        # (page prefetching, localization fan-out, syncs)
+        if key_id is not None and key_id not in self._by_key_id:
+            raise InvalidParameterException(f"'key_id' {key_id} is not one of the pool's keys")
+        if issuer_id is not None and not any(client.issuer_id == issuer_id for client in self.clients):
+            raise InvalidParameterException(f"no key of the pool belongs to issuer '{issuer_id}'")
+
+        token = self._pin.set((key_id, issuer_id))
+        try:
+            yield self
+        finally:
+            self._pin.reset(token)
+
+    @staticmethod
+    def _available(client):
+        # keys whose limits are not known yet go first so every key gets probed
+        if client.rate_limiter is None:
+            return float('inf')
+        available = client.rate_limiter.available
+        return float('inf') if available is None else available
+
+    def _choose(self, method="get"):
+        key_id, issuer_id = self._pin.get() or (None, None)
+        if key_id is None and method.lower() in WRITE_METHODS and self.write_key_id is not None:
+            # the write key only takes writes of its own team
+            if issuer_id is None or self._by_key_id[self.write_key_id].issuer_id == issuer_id:
+                key_id = self.write_key_id
+        if key_id is not None:
+            return self._by_key_id[key_id]
+
+        candidates = self.clients
+        if issuer_id is not None:
+            candidates = [client for client in candidates if client.issuer_id == issuer_id]
+
+        # rotate the starting point so keys with equal budgets take turns
+        start = next(self._counter) % len(candidates)
+        return max(candidates[start:] + candidates[:start], key=self._available)
+
+    @property
+    def token(self):
+        return self._choose().token
+
+    def _api_call(self, uri, method="get", post_data=None, file_meta=None, stream=False):
+        if self._flights is None:
+            return self._choose(method)._api_call(uri, method, post_data, file_meta, stream=stream)
+
+        if method.lower() == "get" and not stream:
+            url = uri if uri.startswith(('https://', 'http://')) else self.base_api + uri
+            # callers pinned to different keys or teams may get different answers for the
+            # same url, only callers with the same pin share a request
+            r, shared = self._flights.do((self._pin.get(), url), self._coalesced_get, uri)
+            if shared and self.hooks:
+                self._emit_coalesced(url, r)
+            return r
+
+        try:
+            return self._choose(method)._api_call(uri, method, post_data, file_meta, stream=stream)
+        finally:
+            if method.lower() != "get":
+                self._flights.forget()
+
+    def _coalesced_get(self, uri):
+        return self._choose()._api_call(uri)
+
+    def _send(self, method, url, headers, data, stream=False, retry=None):
+        return self._choose(method)._send(method, url, headers, data, stream=stream, retry=retry)
@@ -0,0 +1,159 @@
+import json
+import os
+import time
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+
+from .exceptions import *
+from .signing import write_atomic
+
+
+def price_key(customer_price):
+    # prices are kept as integer thousandths so lookups are exact for every currency
+    return int(Decimal(str(customer_price)) * 1000)
+
+
+class TerritoryPrices:
+    __slots__ = ('prices', 'ids', 'tiers', '_tier_positions', 'updated_at')
+
+    def __init__(self, prices, ids, tiers, updated_at):
+        self.prices = prices
+        self.ids = ids
+        self.tiers = tiers
+        self.updated_at = updated_at
+        self._tier_positions = {tier: position for position, tier in enumerate(tiers) if tier is not None}
+
+    @classmethod
+    def from_points(cls, points, updated_at=None):
+        # points: iterable of (price_key, price_point_id, tier)
+        points = sorted(points)
+        return cls(array('q', (point[0] for point in points)), [point[1] for point in points],
+                   [point[2] for point in points], updated_at or time.time())
+
+    def by_price(self, customer_price):
+        key = price_key(customer_price)
+        position = bisect_left(self.prices, key)
+        if position < len(self.prices) and self.prices[position] == key:
+            return self.ids[position]
+        return None
+
+    def by_tier(self, tier):
+        position = self._tier_positions.get(str(tier))
+        return self.ids[position] if position is not None else None
+
+    def to_dict(self):
+        return {'updated_at': self.updated_at, 'prices': self.prices.tolist(), 'ids': self.ids, 'tiers': self.tiers}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(array('q', data['prices']), data['ids'], data['tiers'], data['updated_at'])
+
+
+class PricePointIndex:
+    # sorted, array-backed price points of one in-app purchase, one table per territory,
+    # answering (territory, customer price) by binary search and (territory, tier) by dict lookup
+    def __init__(self, iap_id, territories=None, complete=False):
+        self.iap_id = iap_id
+        self.territories = territories or {}
+        self.complete = complete  # every territory was fetched, a missing one has no price points
+
+    @classmethod
+    def build(cls, client, iap_id, territories=None):
+        index = cls(iap_id)
+        index.refresh(client, territories)
+        return index
+
+    def stale_territories(self, max_age):
+        now = time.time()
+        return [territory for territory, prices in self.territories.items() if now - prices.updated_at > max_age]
+
+    def refresh(self, client, territories=None, max_age=None):
+        # refetches the given territories, or every territory older than `max_age` seconds,
+        # or everything when neither is given, which is one paged fetch at the maximum page size
+        if territories is None and max_age is not None:
+            territories = self.stale_territories(max_age)
+            if not territories:
+                return self
+        if territories is None:
+            self.complete = True
+
+        grouped = {}
+        for country_code in territories or [None]:
+            for point in client.iter_iap_price_points(self.iap_id, country_code=country_code):
+                territory = point['relationships']['territory']['data']['id']
+                attributes = point['attributes']
+                tier = attributes.get('priceTier')
+                grouped.setdefault(territory, []).append(
+                    (price_key(attributes['customerPrice']), point['id'], str(tier) if tier is not None else None)
+                )
+
+        updated_at = time.time()
+        for territory, points in grouped.items():
+            self.territories[territory] = TerritoryPrices.from_points(points, updated_at)
+
+        return self
+
+    def _territory(self, territory):
+        try:
+            return self.territories[territory]
+        except KeyError:
+            raise InvalidParameterException(f"no price points indexed for territory '{territory}' "
+                                            f"of in-app purchase '{self.iap_id}'")
+
+    def find(self, territory, customer_price=None, tier=None):
+        if customer_price is None and tier is None:
+            raise InvalidParameterException("either 'customer_price' or 'tier' is required for "
+                                            "looking up a price point")
+
+        prices = self._territory(territory)
+        return prices.by_price(customer_price) if customer_price is not None else prices.by_tier(tier)
+
+    def save(self, path):
+        # a unique temp file per writer, so stores sharing a directory never write into each other's file
+        data = {'iap_id': self.iap_id, 'complete': self.complete,
+                'territories': {name: prices.to_dict() for name, prices in self.territories.items()}}
+        return write_atomic(path, json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+
+        return cls(data['iap_id'], {name: TerritoryPrices.from_dict(prices)
+                                    for name, prices in data['territories'].items()},
+                   data.get('complete', False))
+
+
+class PricePointStore:
+    # keeps one index per in-app purchase in memory and on disk. The first lookup of a purchase
+    # fetches the price points of every territory at once and saves the index once; after that
+    # the API is only asked again for territories that went stale
+    def __init__(self, client, directory, max_age=7 * 24 * 3600):
+        self.client = client
+        self.directory = directory
+        self.max_age = max_age
+        self._indexes = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, iap_id):
+        return os.path.join(self.directory, f"{iap_id}.json")
+
+    def get(self, iap_id):
+        index = self._indexes.get(iap_id)
+        if index is None:
+            path = self._path(iap_id)
+            index = PricePointIndex.load(path) if os.path.exists(path) else None
+            if index is None or not index.complete:
+                index = PricePointIndex.build(self.client, iap_id)
+                index.save(path)
+            else:
+                stale = index.stale_territories(self.max_age) if self.max_age is not None else []
+                if stale:
+                    index.refresh(self.client, stale).save(path)
+            self._indexes[iap_id] = index
+
+        return index
+
+    def find(self, iap_id, territory, customer_price=None, tier=None):
+        return self.get(iap_id).find(territory, customer_price=customer_price, tier=tier)
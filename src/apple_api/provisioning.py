@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from .exceptions import *
+from .executors import ThreadPool
+from .pricing import PricePointStore
+from .query import Query
+from .signing import write_atomic
+
+NON_RENEWING = 'NON_RENEWING_SUBSCRIPTION'
+AUTO_RENEWABLE = 'AUTO_RENEWABLE_SUBSCRIPTION'
+
+
+class Step:
+    __slots__ = ('key', 'func', 'deps')
+
+    def __init__(self, key, func, deps=()):
+        self.key = key
+        self.func = func  # called with the results of `deps`, returns a JSON-serializable result
+        self.deps = tuple(deps)
+
+    def __repr__(self):
+        return f"<Step {self.key}>"
+
+
+def _created_id(r):
+    r.raise_for_status()
+    return r.json()['data']['id']
+
+
+def _checked(r):
+    r.raise_for_status()
+    return True
+
+
+class Provisioner:
+    # creates in-app purchases and subscriptions from a manifest, e.g.
+    #   [{"product_id": "com.example.pass.month", "type": "NON_RENEWING_SUBSCRIPTION", "name": "Month pass",
+    #     "localizations": [{"locale": "en-US", "name": "Month pass", "description": "30 days"}],
+    #     "price": {"territory": "USA", "customer_price": "4.99"},
+    #     "screenshot": "screens/month.png", "submit": true},
+    #    {"product_id": "com.example.pro.year", "type": "AUTO_RENEWABLE_SUBSCRIPTION", "name": "Pro yearly",
+    #     "subscription_group": {"name": "Pro"}, "subscription_period": "ONE_YEAR", "group_level": 1}]
+    # Every product becomes a chain of steps (create -> localizations, price, screenshot ->
+    # submit), subscription groups named in the manifest are created once and shared. Steps
+    # whose dependencies are done run concurrently, up to `max_workers` at a time. The result
+    # of every finished step (mostly the created id) is written to the checkpoint file, so
+    # running the same manifest again skips finished steps and retries only failed or blocked ones
+    def __init__(self, client, manifest, checkpoint_path, max_workers=8, price_points=None):
+        if isinstance(manifest, str):
+            with open(manifest) as file:
+                manifest = json.load(file)
+
+        self.client = client
+        self.products = manifest['products'] if isinstance(manifest, dict) else manifest
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.price_points = price_points or PricePointStore(
+            client, os.path.join(os.path.dirname(os.path.abspath(checkpoint_path)), 'price-points'))
+        self.results = self._load_checkpoint()
+        self._lock = threading.Lock()
+        self.steps = self.plan()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as file:
+                return json.load(file)['steps']
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self):
+        write_atomic(self.checkpoint_path, json.dumps({'steps': self.results}, indent=1).encode('utf-8'))
+
+    # -- planning
+
+    def plan(self):
+        steps = {}
+
+        def add(step):
+            steps[step.key] = step
+            return step.key
+
+        for product in self.products:
+            product_id = product.get('product_id')
+            if not product_id or not product.get('name'):
+                raise InvalidParameterException(f"'product_id' and 'name' are mandatory for every product "
+                                                f"of the manifest")
+
+            product_type = product.get('type', NON_RENEWING)
+            if product_type == NON_RENEWING:
+                self._plan_iap(product, add)
+            elif product_type == AUTO_RENEWABLE:
+                self._plan_subscription(product, add, steps)
+            else:
+                raise InvalidParameterException(f"invalid value provided for 'type' of product '{product_id}'. "
+                                                f"Possible values: {[NON_RENEWING, AUTO_RENEWABLE]}")
+        return steps
+
+    def _plan_iap(self, product, add):
+        product_id = product['product_id']
+        created = add(Step(f"{product_id}:create", lambda: self._create_iap(product)))
+
+        done = []
+        for localization in product.get('localizations') or []:
+            done.append(add(Step(
+                f"{product_id}:localization:{localization['locale']}",
+                lambda iap_id, localization=localization: _checked(self.client.create_iap_purchase_localization(
+                    iap_id, localization['name'], localization['locale'], localization.get('description'))),
+                [created]
+            )))
+        if product.get('price'):
+            done.append(add(Step(f"{product_id}:price",
+                                 lambda iap_id: self._set_price(product_id, iap_id, product['price']), [created])))
+        if product.get('screenshot'):
+            done.append(add(Step(
+                f"{product_id}:screenshot",
+                lambda iap_id: self._upload_screenshot(iap_id, product['screenshot']),
+                [created]
+            )))
+        if product.get('submit'):
+            add(Step(f"{product_id}:submit",
+                     lambda iap_id, *_: _checked(self.client.submit_nr_subscription_for_review(iap_id)),
+                     [created] + done))
+
+    def _plan_subscription(self, product, add, steps):
+        product_id = product['product_id']
+        unsupported = [name for name in ('localizations', 'price', 'screenshot', 'submit') if product.get(name)]
+        if unsupported:
+            raise InvalidParameterException(f"{unsupported} are not supported for auto-renewable subscription "
+                                            f"'{product_id}' yet")
+
+        group = product.get('subscription_group')
+        if isinstance(group, dict):
+            group_key = f"group:{group['name']}"
+            if group_key not in steps:
+                add(Step(group_key, lambda: self._create_group(group['name'])))
+            add(Step(f"{product_id}:create", lambda sg_id: self._create_subscription(sg_id, product), [group_key]))
+        elif group:
+            add(Step(f"{product_id}:create", lambda: self._create_subscription(group, product)))
+        else:
+            raise InvalidParameterException(f"'subscription_group' is mandatory for auto-renewable "
+                                            f"subscription '{product_id}'")
+
+    # -- steps
+
+    def _adopt_on_conflict(self, r, existing):
+        # a create that succeeded before its checkpoint was written fails with 409 on the
+        # next run, the existing resource is used instead
+        if r.status_code == 409:
+            for resource in existing():
+                return resource['id']
+        return _created_id(r)
+
+    def _create_iap(self, product):
+        r = self.client.create_iap_nr_subscription(product['name'], product['product_id'], product.get('review_note'))
+        return self._adopt_on_conflict(r, lambda: self.client.iter_in_app_purchases(
+            self.client.app_id, query=Query().filter('productId', product['product_id'])))
+
+    def _create_group(self, name):
+        r = self.client.create_subscription_group(name)
+        return self._adopt_on_conflict(r, lambda: self.client.iter_subscription_groups(
+            query=Query().filter('referenceName', name)))
+
+    def _create_subscription(self, sg_id, product):
+        r = self.client.create_ar_subscription(sg_id, product['name'], product['product_id'],
+                                               product.get('subscription_period'), product.get('group_level'),
+                                               product.get('review_note'))
+        return self._adopt_on_conflict(r, lambda: self.client.iter_subscriptions_in_a_group(
+            sg_id, query=Query().filter('productId', product['product_id'])))
+
+    def _set_price(self, product_id, iap_id, price):
+        price_point_id = self.price_points.find(iap_id, price['territory'], customer_price=price.get('customer_price'),
+                                                tier=price.get('tier'))
+        if price_point_id is None:
+            wanted = f"price {price['customer_price']}" if price.get('customer_price') else f"tier {price.get('tier')}"
+            raise InvalidParameterException(f"no price point of product '{product_id}' in territory "
+                                            f"'{price['territory']}' matches {wanted}")
+        r = self.client.create_iap_price_schedule(iap_id, price_point_id=price_point_id,
+                                                  price=price.get('customer_price') or price.get('tier'),
+                                                  start_date=price.get('start_date'))
+        return _checked(r)
+
+    def _upload_screenshot(self, iap_id, file_path):
+        r = self.client.create_iap_review_screenshot_request(iap_id, file_path)
+        r.raise_for_status()
+        return r.json()['data']['id']
+
+    # -- execution
+
+    def run(self):
+        # returns {'completed': [...], 'skipped': [...], 'failed': {key: exception}, 'blocked': [...]}
+        done = {key for key in self.steps if key in self.results}
+        summary = {'completed': [], 'skipped': sorted(done), 'failed': {}, 'blocked': []}
+        waiting = {key: step for key, step in self.steps.items() if key not in done}
+        running = {}
+
+        with ThreadPool(max_workers=self.max_workers) as executor:
+            while waiting or running:
+                for key, step in list(waiting.items()):
+                    if any(dep in summary['failed'] or dep in summary['blocked'] for dep in step.deps):
+                        summary['blocked'].append(key)
+                        del waiting[key]
+                    elif all(dep in done for dep in step.deps):
+                        args = [self.results[dep] for dep in step.deps]
+                        running[executor.submit(step.func, *args)] = key
+                        del waiting[key]
+
+                if not running:
+                    summary['blocked'].extend(waiting)
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = running.pop(future)
+                    try:
+                        result = future.result()
+                    except (Exception, InvalidParameterException, UploadFailedException) as exc:
+                        summary['failed'][key] = exc
+                        continue
+
+                    with self._lock:
+                        self.results[key] = result
+                        self._save_checkpoint()
+                    done.add(key)
+                    summary['completed'].append(key)
+
+        return summary
@@ -0,0 +1,93 @@
+from urllib.parse import urlencode
+
+
+def _join(values):
+    if isinstance(values, (list, tuple, set, frozenset)):
+        return ','.join(str(value) for value in values)
+    return str(values)
+
+
+class Query:
+    # builds JSON:API query strings, e.g.
+    #   Query().fields('builds', 'version', 'processingState').filter('app', app_id).sort('-uploadedDate')
+    # encodes to `fields[builds]=version,processingState&filter[app]=...&sort=-uploadedDate`
+    def __init__(self, fields=None, filter=None, include=None, sort=None, limit=None, params=None):
+        self._params = {}
+        for resource_type, names in (fields or {}).items():
+            self.fields(resource_type, names)
+        for name, values in (filter or {}).items():
+            self.filter(name, values)
+        if include:
+            self.include(include)
+        if sort:
+            self.sort(sort)
+        if limit is not None:
+            self.limit(limit)
+        for name, value in (params or {}).items():
+            self.param(name, value)
+
+    def __repr__(self):
+        return f"<Query {self.encode()}>"
+
+    def __contains__(self, name):
+        return name in self._params
+
+    def __bool__(self):
+        return bool(self._params)
+
+    def param(self, name, value):
+        if value is None:
+            self._params.pop(name, None)
+        else:
+            self._params[name] = _join(value)
+        return self
+
+    def fields(self, resource_type, *names):
+        return self.param(f"fields[{resource_type}]", names[0] if len(names) == 1 else names)
+
+    def filter(self, name, *values):
+        return self.param(f"filter[{name}]", values[0] if len(values) == 1 else values)
+
+    def include(self, *relationships):
+        return self.param('include', relationships[0] if len(relationships) == 1 else relationships)
+
+    def sort(self, *keys):
+        return self.param('sort', keys[0] if len(keys) == 1 else keys)
+
+    def limit(self, limit, relationship=None):
+        return self.param(f"limit[{relationship}]" if relationship else 'limit', limit)
+
+    def copy(self):
+        query = Query()
+        query._params = dict(self._params)
+        return query
+
+    def to_params(self):
+        return list(self._params.items())
+
+    def encode(self):
+        return urlencode(self.to_params(), safe='[],')
+
+    def apply(self, uri):
+        if not self._params:
+            return uri
+
+        separator = '&' if '?' in uri else '?'
+        return uri + separator + self.encode()
+
+
+def as_query(query=None):
+    # accepts a Query, a dict of raw parameters ({'filter[app]': '123'}) or None
+    if isinstance(query, Query):
+        return query.copy()
+
+    return Query(params=query)
+
+
+def add_query(uri, query=None, **params):
+    query = as_query(query)
+    for name, value in params.items():
+        if name not in query:
+            query.param(name, value)
+
+    return query.apply(uri)
@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+
+from .lazy import LazyModule
+
+email_utils = LazyModule('email.utils')  # only for HTTP-date Retry-After values
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('get', 'put', 'patch', 'delete')
+
+
+def parse_rate_limit(value):
+    # App Store Connect sends `X-Rate-Limit: user-hour-lim:3600;user-hour-rem:3599;`
+    limits = {}
+    for part in (value or '').split(';'):
+        name, _, number = part.partition(':')
+        if number.strip().isdigit():
+            limits[name.strip()] = int(number)
+
+    return limits.get('user-hour-lim'), limits.get('user-hour-rem')
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, email_utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    # token bucket holding the hourly request budget of one API key. The level is synced
+    # to `user-hour-rem` on every response and refills at `user-hour-lim` per hour, so
+    # callers burst through the remaining quota and are then paced at the sustainable rate.
+    # Nothing is paced until the first response has reported the limits.
+    def __init__(self, hourly_limit=None, reserve=0):
+        self.limit = hourly_limit
+        self.remaining = hourly_limit
+        self.reserve = reserve  # requests left untouched for other consumers of the same key
+        self._tokens = float(hourly_limit) if hourly_limit else None
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        return {'limit': self.limit, 'remaining': self.remaining}
+
+    @property
+    def available(self):
+        # requests that can be sent right now without waiting, None until the limits are known
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens is None or not self.limit:
+                return None
+            return max(0.0, self._tokens - self.reserve)
+
+    def _refill(self, now):
+        if self._tokens is not None and self.limit:
+            self._tokens = min(float(self.limit), self._tokens + (now - self._updated) * self.limit / 3600.0)
+        self._updated = now
+
+    def acquire(self):
+        # takes one token and returns how many seconds the caller has to wait before sending
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens is None or not self.limit:
+                return 0.0
+
+            self._tokens -= 1
+            deficit = self.reserve - self._tokens
+            return max(0.0, deficit * 3600.0 / self.limit)
+
+    def update(self, headers):
+        limit, remaining = parse_rate_limit(headers.get('X-Rate-Limit'))
+        if limit is None and remaining is None:
+            return
+
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None:
+                self.remaining = remaining
+                self._tokens = float(remaining)
+
+    def exhaust(self):
+        # called on a 429, everyone waits for the bucket to refill
+        with self._lock:
+            self._refill(time.monotonic())
+            self.remaining = 0
+            if self._tokens is not None:
+                self._tokens = min(self._tokens, 0.0)
+
+
+class RetryPolicy:
+    # 429s are retried for every method since the server rejected the request outright,
+    # 5xx responses and connection errors only for methods that are safe to repeat
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60.0, statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.methods = methods
+
+    def should_retry_response(self, method, status_code, attempt):
+        if attempt >= self.max_retries or status_code not in self.statuses:
+            return False
+
+        return status_code == 429 or method in self.methods
+
+    def should_retry_error(self, method, attempt):
+        return attempt < self.max_retries and method in self.methods
+
+    def backoff(self, attempt, retry_after=None):
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.max_backoff)
+
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
@@ -0,0 +1,264 @@
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import as_completed
+from datetime import date, datetime, timedelta
+
+import requests
+
+from .exceptions import *
+from .executors import ThreadPool
+
+INSERT_BATCH = 5000
+SALES_SETTLE = timedelta(days=3)  # sales reports are published within a day or two
+FINANCE_SETTLE = timedelta(days=45)  # finance reports follow the fiscal month
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def _month_start(day, months=0):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def report_dates(start, end, frequency='DAILY'):
+    # the report_date values covering [start, end] in the format the API expects; weekly
+    # reports are addressed by the sunday ending the week
+    start, end = _as_date(start), _as_date(end)
+    if frequency == 'DAILY':
+        return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+    if frequency == 'WEEKLY':
+        sunday = start + timedelta(days=(6 - start.weekday()) % 7)
+        return [(sunday + timedelta(weeks=week)).isoformat() for week in range((end - sunday).days // 7 + 1)]
+    if frequency == 'MONTHLY':
+        months = (end.year - start.year) * 12 + end.month - start.month
+        return [_month_start(start, month).strftime('%Y-%m') for month in range(months + 1)]
+    if frequency == 'YEARLY':
+        return [str(year) for year in range(start.year, end.year + 1)]
+
+    raise InvalidParameterException(f"'{frequency}' is not a valid report frequency")
+
+
+def period_end(report_date, frequency):
+    if frequency in ('DAILY', 'WEEKLY'):
+        return date.fromisoformat(report_date) + timedelta(days=1)
+    if frequency == 'MONTHLY':
+        return _month_start(date.fromisoformat(report_date + '-01'), 1)
+    return date(int(report_date) + 1, 1, 1)
+
+
+def _column(name):
+    column = re.sub(r'[^0-9a-z]+', '_', name.strip().lower()).strip('_') or 'column'
+    return f'c_{column}' if column[0].isdigit() else column
+
+
+class ReportJob:
+    __slots__ = ('kind', 'report_type', 'report_sub_type', 'frequency', 'version', 'vendor_number', 'report_date')
+
+    def __init__(self, kind, report_type, report_sub_type, frequency, version, vendor_number, report_date):
+        self.kind = kind  # 'sales' or 'finance', for finance reports report_sub_type holds the region code
+        self.report_type = report_type
+        self.report_sub_type = report_sub_type
+        self.frequency = frequency
+        self.version = version
+        self.vendor_number = vendor_number
+        self.report_date = report_date
+
+    def __repr__(self):
+        return f"<ReportJob {self.table} {self.vendor_number} {self.report_date}>"
+
+    @property
+    def key(self):
+        return (self.report_type, self.report_sub_type, self.frequency, self.vendor_number, self.report_date)
+
+    @property
+    def table(self):
+        return _column(f"{self.report_type}_{self.report_sub_type}_{self.frequency}")
+
+    def rows(self, client):
+        if self.kind == 'finance':
+            return client.iter_finance_report_rows(self.vendor_number, self.report_date, self.report_sub_type,
+                                                   self.report_type)
+        return client.iter_sales_report_rows(self.vendor_number, self.report_date, self.report_type,
+                                             self.report_sub_type, self.frequency, self.version)
+
+
+class ReportSync:
+    # downloads sales and finance reports into one SQLite database, one table per report
+    # type/sub type/frequency with a column per TSV header field, e.g.
+    #   SELECT report_date, SUM(units) FROM sales_summary_daily GROUP BY report_date
+    # Reports are fetched in parallel and every report is committed together with its entry
+    # in `report_files`, so an interrupted sync resumes where it stopped. Days without sales
+    # (404) are remembered once the report period has settled, younger ones are asked again
+    def __init__(self, client, path, max_workers=4):
+        self.client = client
+        self.path = path
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS report_files (report_type TEXT, report_sub_type TEXT, frequency TEXT, "
+            "vendor_number TEXT, report_date TEXT, version TEXT, status TEXT, rows INTEGER, fetched_at REAL, "
+            "settled INTEGER, PRIMARY KEY (report_type, report_sub_type, frequency, vendor_number, report_date))"
+        )
+        self._db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def query(self, sql, parameters=()):
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def sales_jobs(self, vendor_numbers, start, end, report_types=(('SALES', 'SUMMARY'),), frequency='DAILY',
+                   version=None):
+        vendor_numbers = [vendor_numbers] if isinstance(vendor_numbers, (str, int)) else vendor_numbers
+        return [ReportJob('sales', report_type, report_sub_type, frequency, version, str(vendor_number), report_date)
+                for report_type, report_sub_type in report_types
+                for vendor_number in vendor_numbers
+                for report_date in report_dates(start, end, frequency)]
+
+    def finance_jobs(self, vendor_numbers, start, end, region_codes=('ZZ',), report_type='FINANCIAL'):
+        vendor_numbers = [vendor_numbers] if isinstance(vendor_numbers, (str, int)) else vendor_numbers
+        return [ReportJob('finance', report_type, region_code, 'MONTHLY', None, str(vendor_number), report_date)
+                for region_code in region_codes
+                for vendor_number in vendor_numbers
+                for report_date in report_dates(start, end, 'MONTHLY')]
+
+    def sync_sales(self, vendor_numbers, start, end, report_types=(('SALES', 'SUMMARY'),), frequency='DAILY',
+                   version=None):
+        return self.run(self.sales_jobs(vendor_numbers, start, end, report_types, frequency, version))
+
+    def sync_finance(self, vendor_numbers, start, end, region_codes=('ZZ',), report_type='FINANCIAL'):
+        return self.run(self.finance_jobs(vendor_numbers, start, end, region_codes, report_type))
+
+    def pending(self, jobs):
+        with self._lock:
+            done = {tuple(row) for row in self._db.execute(
+                "SELECT report_type, report_sub_type, frequency, vendor_number, report_date FROM report_files "
+                "WHERE status = 'complete' OR settled = 1"
+            )}
+        return [job for job in jobs if job.key not in done]
+
+    def run(self, jobs):
+        # returns counts of fetched, empty, skipped and failed reports; failed reports are
+        # listed with their exception and fetched again by the next run
+        pending = self.pending(jobs)
+        summary = {'fetched': 0, 'rows': 0, 'empty': 0, 'skipped': len(jobs) - len(pending), 'failed': []}
+        with ThreadPool(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._sync_report, job): job for job in pending}
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except Exception as exc:
+                    summary['failed'].append((futures[future], exc))
+                    continue
+
+                if rows is None:
+                    summary['empty'] += 1
+                else:
+                    summary['fetched'] += 1
+                    summary['rows'] += rows
+        return summary
+
+    def _sync_report(self, job):
+        # every report gets its own connection: rows are staged in a temporary table (private
+        # to the connection, so no lock on the database) while they stream in, then copied
+        # into the report table in one short transaction. Memory stays flat, downloads run in
+        # parallel and an interrupted report leaves nothing behind
+        db = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+        try:
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA temp_store=FILE")
+            try:
+                header, rows = self._stage(db, job)
+            except requests.HTTPError as exc:
+                if exc.response is None or exc.response.status_code != 404:
+                    raise
+                return self._store(db, job, None, None)
+
+            return self._store(db, job, header, rows)
+        finally:
+            db.close()
+
+    def _stage(self, db, job):
+        header, statement, batch, rows = None, None, [], 0
+        db.execute("BEGIN")
+        try:
+            for row in job.rows(self.client):
+                if header is None:
+                    header = list(row)
+                    db.execute(f"CREATE TEMP TABLE staging ({', '.join(_column(name) for name in header)})")
+                    statement = f"INSERT INTO temp.staging VALUES ({', '.join('?' * len(header))})"
+                batch.append(tuple(map(row.get, header)))
+                if len(batch) >= INSERT_BATCH:
+                    db.executemany(statement, batch)
+                    rows += len(batch)
+                    batch = []
+
+            if batch:
+                db.executemany(statement, batch)
+                rows += len(batch)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return header, rows
+
+    def _ensure_table(self, db, table, header):
+        # runs inside the write transaction, which also serializes access to the column cache
+        columns = self._columns.get(table)
+        if columns is None:
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} (vendor_number TEXT, report_date TEXT)")
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_date ON {table} (vendor_number, report_date)")
+            columns = self._columns[table] = {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+        names = [_column(name) for name in header]
+        for name in names:
+            if name not in columns:
+                # report versions add fields over time
+                db.execute(f"ALTER TABLE {table} ADD COLUMN {name}")
+                columns.add(name)
+        return names
+
+    def _store(self, db, job, header, rows):
+        # rows is None for reports answered with 404
+        now = time.time()
+        settle = FINANCE_SETTLE if job.kind == 'finance' else SALES_SETTLE
+        settled = date.today() >= period_end(job.report_date, job.frequency) + settle
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if header:
+                names = ', '.join(self._ensure_table(db, job.table, header))
+                db.execute(f"DELETE FROM main.{job.table} WHERE vendor_number = ? AND report_date = ?",
+                           (job.vendor_number, job.report_date))
+                db.execute(f"INSERT INTO main.{job.table} (vendor_number, report_date, {names}) "
+                           f"SELECT ?, ?, {names} FROM temp.staging", (job.vendor_number, job.report_date))
+
+            db.execute(
+                "INSERT OR REPLACE INTO main.report_files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                job.key + (job.version, 'complete' if rows is not None else 'empty', rows or 0, now, int(settled))
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            self._columns.pop(job.table, None)  # columns added by the rolled back transaction are gone
+            raise
+        return rows
@@ -0,0 +1,80 @@
+import codecs
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+
+
+class GzipStreamDecoder:
+    # incremental counterpart of gzip.decompress, also handles multi-member archives
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, chunk):
+        data = self._decompressor.decompress(chunk)
+        while self._decompressor.eof and self._decompressor.unused_data:
+            unused_data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data += self._decompressor.decompress(unused_data)
+
+        return data
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class TsvRowParser:
+    # turns decompressed report bytes into dicts keyed by the header row, only the
+    # current partial line is kept between chunks
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._pending = ''
+        self.header = None
+
+    def feed(self, data, final=False):
+        lines = (self._pending + self._decoder.decode(data, final=final)).split('\n')
+        self._pending = '' if final else lines.pop()
+
+        rows = []
+        for line in lines:
+            line = line.rstrip('\r')
+            if not line:
+                continue
+            values = line.split('\t')
+            if self.header is None:
+                self.header = values
+            else:
+                rows.append(dict(zip(self.header, values)))
+
+        return rows
+
+    def close(self):
+        return self.feed(b'', final=True)
+
+
+def iter_decompressed(chunks):
+    decoder = GzipStreamDecoder()
+    for chunk in chunks:
+        if chunk:
+            data = decoder.decompress(chunk)
+            if data:
+                yield data
+
+    data = decoder.flush()
+    if data:
+        yield data
+
+
+def iter_tsv_rows(chunks):
+    parser = TsvRowParser()
+    for data in iter_decompressed(chunks):
+        yield from parser.feed(data)
+
+    yield from parser.close()
+
+
+def write_chunks(chunks, file_path, decompress=True):
+    with open(file_path, 'wb') as file:
+        for data in iter_decompressed(chunks) if decompress else chunks:
+            file.write(data)
+
+    return file_path
@@ -0,0 +1,190 @@
+import json
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:     # optional dependency, install with `pip install apple-api[speedups]`
+    orjson = None
+
+
+def loads(content):
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+
+_EMPTY = MappingProxyType({})
+_layouts = {}  # (type, attribute names) -> _Layout
+
+
+class _Layout:
+    # attribute names shared by every resource of one type and fieldset
+    __slots__ = ('names', 'index')
+
+    def __init__(self, names):
+        self.names = names
+        self.index = {name: position for position, name in enumerate(names)}
+
+
+def _layout(resource_type, names):
+    layout = _layouts.get((resource_type, names))
+    if layout is None:
+        layout = _layouts.setdefault((resource_type, names), _Layout(names))
+    return layout
+
+
+def _linkage(data):
+    if data is None:
+        return None
+    if isinstance(data, list):
+        return [(item['type'], item['id']) for item in data]
+    return data['type'], data['id']
+
+
+class Resource:
+    # compact record for one JSON:API resource object: attribute values are kept in a tuple
+    # whose names are shared by every resource of the same type and fieldset, relationships
+    # keep only their (type, id) linkage and relationship links are dropped. Attributes are
+    # reachable as `resource['customerPrice']`, `resource.get('customerPrice')` or
+    # `resource.customerPrice`
+    __slots__ = ('type', 'id', 'self_url', '_layout', '_values', '_linkage', '_document')
+
+    def __init__(self, raw, document=None):
+        self.type = raw.get('type')
+        self.id = raw.get('id')
+        self.self_url = (raw.get('links') or _EMPTY).get('self')
+        attributes = raw.get('attributes') or _EMPTY
+        self._layout = _layout(self.type, tuple(attributes))
+        self._values = tuple(attributes.values())
+        relationships = raw.get('relationships') or _EMPTY
+        self._linkage = {name: _linkage(relationship['data']) for name, relationship in relationships.items()
+                         if 'data' in relationship} or _EMPTY
+        self._document = document
+
+    def __repr__(self):
+        return f"<Resource {self.type}:{self.id}>"
+
+    def __eq__(self, other):
+        return isinstance(other, Resource) and (self.type, self.id) == (other.type, other.id)
+
+    def __hash__(self):
+        return hash((self.type, self.id))
+
+    def __getitem__(self, name):
+        return self._values[self._layout.index[name]]
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name in Resource.__slots__:
+            raise AttributeError(name)
+        position = self._layout.index.get(name)
+        if position is None:
+            raise AttributeError(f"'{self.type}' resource has no attribute '{name}'")
+        return self._values[position]
+
+    def get(self, name, default=None):
+        position = self._layout.index.get(name)
+        return default if position is None else self._values[position]
+
+    @property
+    def attributes(self):
+        # a new dict on every access
+        return dict(zip(self._layout.names, self._values))
+
+    @property
+    def relationships(self):
+        # the linkage in JSON:API shape, {name: {'data': ...}}
+        return {name: {'data': [{'type': item[0], 'id': item[1]} for item in linkage]
+                       if isinstance(linkage, list) else linkage and {'type': linkage[0], 'id': linkage[1]}}
+                for name, linkage in self._linkage.items()}
+
+    @property
+    def links(self):
+        return {'self': self.self_url} if self.self_url else {}
+
+    def related_ids(self, name):
+        linkage = self._linkage.get(name)
+        if linkage is None:
+            return []
+        return list(linkage) if isinstance(linkage, list) else [linkage]
+
+    def related(self, name):
+        # resolves a relationship against the document's `included` index in O(1); for
+        # to-one relationships a single resource (or None) is returned, otherwise a list
+        linkage = self._linkage.get(name)
+        if linkage is None:
+            return None
+
+        resolve = self._document.get_included if self._document is not None else None
+        resources = [(resolve(*key) if resolve else None) or Resource({'type': key[0], 'id': key[1]}, self._document)
+                     for key in (linkage if isinstance(linkage, list) else [linkage])]
+        return resources if isinstance(linkage, list) else resources[0]
+
+
+class Document:
+    # parses a response body on first access into Resource records and an index of
+    # `included` by (type, id) so relationships resolve without scanning the payload. The
+    # parsed payload is dropped once indexed, only the records, links and meta are kept
+    __slots__ = ('_content', '_raw', '_data', '_included', '_links', '_meta')
+
+    def __init__(self, content=None, raw=None):
+        self._content = content
+        self._raw = raw
+        self._included = None
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(content=response.content)
+
+    def _parse(self):
+        if self._included is not None:
+            return
+
+        raw = self._raw if self._raw is not None else loads(self._content)
+        data = raw.get('data')
+        if isinstance(data, list):
+            self._data = [Resource(item, self) for item in data]
+        else:
+            self._data = Resource(data, self) if data else None
+        self._links = raw.get('links') or {}
+        self._meta = raw.get('meta') or {}
+        self._included = {(item['type'], item['id']): Resource(item, self) for item in raw.get('included') or []}
+        self._content = self._raw = None
+
+    @property
+    def data(self):
+        self._parse()
+        return self._data
+
+    @property
+    def links(self):
+        self._parse()
+        return self._links
+
+    @property
+    def meta(self):
+        self._parse()
+        return self._meta
+
+    @property
+    def next_url(self):
+        return self.links.get('next')
+
+    def __iter__(self):
+        data = self.data
+        if data is None:
+            return iter(())
+        return iter(data if isinstance(data, list) else [data])
+
+    def __len__(self):
+        data = self.data
+        return len(data) if isinstance(data, list) else int(data is not None)
+
+    def get_included(self, resource_type, resource_id):
+        self._parse()
+        return self._included.get((resource_type, resource_id))
+
+    @property
+    def included(self):
+        self._parse()
+        return list(self._included.values())
@@ -0,0 +1,136 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+
+from .executors import ThreadPool
+from .query import Query
+
+ID_BATCH = 50  # resources per filter[id] request
+MANIFEST = '.signing-assets.json'  # files written by the sync, the only ones prune may remove
+
+
+def write_atomic(path, data):
+    # the file is either the old or the new content, never a partial write
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def file_sha256(path):
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class _AssetKind:
+    __slots__ = ('resource_type', 'fields', 'identity', 'content', 'extension')
+
+    def __init__(self, resource_type, fields, identity, content, extension):
+        self.resource_type = resource_type
+        self.fields = fields
+        self.identity = identity  # attribute naming the file, its content never changes
+        self.content = content
+        self.extension = extension
+
+    def file_name(self, resource):
+        return resource['attributes'][self.identity] + self.extension
+
+
+CERTIFICATES = _AssetKind('certificates', ('name', 'serialNumber', 'certificateType', 'expirationDate'),
+                          'serialNumber', 'certificateContent', '.cer')
+PROFILES = _AssetKind('profiles', ('name', 'uuid', 'profileType', 'profileState', 'expirationDate'),
+                      'uuid', 'profileContent', '.mobileprovision')
+
+
+class SigningAssetSync:
+    # mirrors certificates (<serialNumber>.cer) and provisioning profiles (<uuid>.mobileprovision)
+    # into a directory. Listings are requested without the base64 content; only assets that
+    # are missing locally are then fetched, in parallel filter[id] batches. A serial number or
+    # uuid always refers to the same content, so files already present are skipped, and a
+    # downloaded file whose sha256 matches the local copy is not rewritten. The files the sync
+    # owns are recorded in a manifest; `prune` only removes those, never files written by
+    # download_certificate (<name>.cer) or anyone else
+    def __init__(self, client, directory, max_workers=4):
+        self.client = client
+        self.directory = directory
+        self.max_workers = max_workers
+
+    def sync(self, certificates=True, profiles=True, active_profiles_only=True, prune=False):
+        # returns {'certificates': {'written': .., 'unchanged': .., 'skipped': .., 'removed': ..}, 'profiles': ...}
+        os.makedirs(self.directory, exist_ok=True)
+        jobs = []
+        if certificates:
+            jobs.append((CERTIFICATES, Query()))
+        if profiles:
+            jobs.append((PROFILES, Query().filter('profileState', 'ACTIVE') if active_profiles_only else Query()))
+
+        manifest = self._read_manifest()
+        with ThreadPool(max_workers=self.max_workers) as executor:
+            listings = list(executor.map(lambda job: self._list(*job), jobs))
+            stats = {kind.resource_type: self._sync_kind(executor, kind, resources, prune, manifest)
+                     for (kind, _), resources in zip(jobs, listings)}
+        write_atomic(os.path.join(self.directory, MANIFEST), json.dumps(manifest).encode('utf-8'))
+        return stats
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _list(self, kind, query):
+        query.fields(kind.resource_type, kind.fields)
+        return list(self.client.iter_resources(f"/v1/{kind.resource_type}", query=query))
+
+    def _fetch(self, kind, ids):
+        query = Query().filter('id', ids).fields(kind.resource_type, kind.fields + (kind.content,))
+        return list(self.client.iter_resources(f"/v1/{kind.resource_type}", query=query))
+
+    def _sync_kind(self, executor, kind, resources, prune, manifest):
+        stats = {'written': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+        missing = []
+        for resource in resources:
+            if os.path.exists(os.path.join(self.directory, kind.file_name(resource))):
+                stats['skipped'] += 1
+            else:
+                missing.append(resource['id'])
+
+        batches = [missing[start:start + ID_BATCH] for start in range(0, len(missing), ID_BATCH)]
+        for downloaded in executor.map(lambda ids: self._fetch(kind, ids), batches):
+            for resource in downloaded:
+                stats['written' if self._save(kind, resource) else 'unchanged'] += 1
+
+        wanted = {kind.file_name(resource) for resource in resources}
+        owned = set(manifest.get(kind.resource_type) or ())
+        if prune:
+            for name in owned - wanted:
+                path = os.path.join(self.directory, name)
+                if os.path.exists(path):
+                    os.remove(path)
+                    stats['removed'] += 1
+            owned = set()
+        manifest[kind.resource_type] = sorted(owned | wanted)
+        return stats
+
+    def _save(self, kind, resource):
+        content = base64.b64decode(resource['attributes'][kind.content])
+        path = os.path.join(self.directory, kind.file_name(resource))
+        if file_sha256(path) == hashlib.sha256(content).hexdigest():
+            return False
+        write_atomic(path, content)
+        return True
@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from .lazy import LazyModule
+
+try:
+    import fcntl
+except ImportError:     # no cross-process locking on windows, processes may mint concurrently
+    fcntl = None
+
+jwt_algorithms = LazyModule('jwt.algorithms')  # pulls in cryptography, loaded with the first key
+
+TOKEN_LIFETIME = 20 * 60  # seconds, the `exp` claim
+TOKEN_MAX_AGE = 15 * 60  # tokens older than this are never sent
+TOKEN_REFRESH_AGE = 12 * 60  # from here on the next token is minted in the background
+
+_signing_keys = {}
+_signing_keys_lock = threading.Lock()
+
+
+def load_signing_key(key_file, algorithm='ES256'):
+    # parsed private keys are kept per path and only reloaded when the file changes
+    stat = os.stat(key_file)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _signing_keys_lock:
+        cached = _signing_keys.get((key_file, algorithm))
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with open(key_file, 'r') as file:
+        key = jwt_algorithms.get_default_algorithms()[algorithm].prepare_key(file.read())
+    with _signing_keys_lock:
+        _signing_keys[(key_file, algorithm)] = (version, key)
+    return key
+
+
+class MemoryTokenStore:
+    # shares tokens between the clients of one process, e.g. several workers using the same key
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, max_age=TOKEN_MAX_AGE):
+        entry = self._tokens.get(key)
+        if entry and time.time() - entry['generated'] < max_age:
+            return entry['token'], entry['generated']
+        return None
+
+    def get_or_create(self, key, max_age, create):
+        # returns (token, generated timestamp), calling `create()` only when no token younger
+        # than max_age is stored
+        with self._lock:
+            entry = self.get(key, max_age)
+            if entry is None:
+                entry = create(), time.time()
+                self._tokens[key] = {'token': entry[0], 'generated': entry[1]}
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._tokens = {}
+
+
+class FileTokenStore:
+    # shares tokens between the processes of one host through a JSON file. Reads are lock free
+    # and only re-parse the file when it changed; minting happens under an exclusive flock so
+    # one process signs a token and every other process picks it up
+    def __init__(self, path):
+        self.path = path
+        self._cached = (None, {})
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        cached_version, tokens = self._cached
+        if cached_version != version:
+            try:
+                with open(self.path, 'r') as file:
+                    tokens = json.load(file)
+            except (OSError, ValueError):
+                tokens = {}
+            self._cached = (version, tokens)
+        return tokens
+
+    def _write(self, tokens):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tokens-')  # created with mode 0600
+        try:
+            with os.fdopen(fd, 'w') as file:
+                json.dump(tokens, file)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def get(self, key, max_age=TOKEN_MAX_AGE):
+        entry = self._read().get(key)
+        if entry and time.time() - entry['generated'] < max_age:
+            return entry['token'], entry['generated']
+        return None
+
+    def get_or_create(self, key, max_age, create):
+        entry = self.get(key, max_age)
+        if entry is not None:
+            return entry
+
+        with self._locked():
+            entry = self.get(key, max_age)  # another process may have minted one meanwhile
+            if entry is None:
+                entry = create(), time.time()
+                now = time.time()
+                tokens = {name: value for name, value in self._read().items()
+                          if now - value['generated'] < TOKEN_LIFETIME}
+                tokens[key] = {'token': entry[0], 'generated': entry[1]}
+                self._write(tokens)
+            return entry
+
+    def clear(self):
+        with self._locked():
+            self._write({})
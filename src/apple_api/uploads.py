@@ -0,0 +1,128 @@
+import hashlib
+import mmap
+import os
+from .exceptions import *
+from .executors import ThreadPool
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_md5(file_path):
+    checksum = hashlib.md5()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+def md5_of_buffer(view):
+    checksum = hashlib.md5()
+    for offset in range(0, len(view), HASH_CHUNK_SIZE):
+        checksum.update(view[offset:offset + HASH_CHUNK_SIZE])
+
+    return checksum.hexdigest()
+
+
+def operation_headers(operation):
+    return {header['name']: header['value'] for header in operation.get('requestHeaders') or []}
+
+
+def operation_slice(view, operation):
+    offset = operation.get('offset') or 0
+    length = operation.get('length')
+    if length is None:
+        length = len(view) - offset
+
+    return view[offset:offset + length]
+
+
+class MappedFile:
+    # read-only memory map of an asset, parts are handed out as zero-copy memoryviews
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = None
+        self._mmap = None
+        self.view = None
+
+    def __enter__(self):
+        self._file = open(self.file_path, 'rb')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.close()
+            raise InvalidParameterException(f"'{self.file_path}' is empty, nothing to upload")
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self._mmap)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+class PartReader:
+    # file-like wrapper so requests streams a memoryview and can rewind it on retries
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        data = self._view[self._position:end]
+        self._position = end
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(offset, len(self._view)))
+        return self._position
+
+
+class AssetUploader:
+    # runs every upload operation of an asset reservation (screenshots, previews, ...)
+    # in parallel straight from a memory-mapped file while the checksum Apple expects on
+    # commit is computed from the same mapping, so the file is read from disk once
+    def __init__(self, client, max_workers=4, retry=None):
+        self.client = client
+        self.max_workers = max_workers
+        self.retry = retry
+
+    def upload(self, upload_operations, file_path):
+        if not upload_operations or not file_path:
+            raise InvalidParameterException("'upload_operations' and 'file_path' are required for "
+                                            "uploading an asset")
+
+        with MappedFile(file_path) as mapped:
+            workers = max(1, min(self.max_workers, len(upload_operations)))
+            with ThreadPool(max_workers=workers) as executor:
+                futures = [executor.submit(self._upload_part, operation, mapped.view)
+                           for operation in upload_operations]
+                checksum = md5_of_buffer(mapped.view)
+                for future in futures:
+                    future.result()
+
+        return checksum
+
+    def _upload_part(self, operation, view):
+        part = operation_slice(view, operation)
+        length = len(part)
+        try:
+            r = self.client._send(operation.get('method', 'PUT').lower(), operation['url'],
+                                  operation_headers(operation), PartReader(part), retry=self.retry)
+            r.close()
+        finally:
+            part.release()
+
+        if not r.ok:
+            raise UploadFailedException(f"upload of {length} bytes at offset {operation.get('offset') or 0} "
+                                        f"failed with status {r.status_code}")
@@ -0,0 +1,178 @@
+import asyncio
+import random
+import threading
+import time
+
+from .exceptions import *
+from .query import Query
+
+TERMINAL_STATES = ('VALID', 'FAILED', 'INVALID')
+FIELDS = ('version', 'processingState', 'uploadedDate')
+ID_BATCH = 100  # build ids per filter[id] request
+
+
+class BuildTransition:
+    __slots__ = ('build_id', 'version', 'previous_state', 'state', 'build')
+
+    def __init__(self, build_id, version, previous_state, state, build):
+        self.build_id = build_id
+        self.version = version
+        self.previous_state = previous_state  # None the first time a build is seen
+        self.state = state
+        self.build = build  # the raw JSON:API resource
+
+    def __repr__(self):
+        return f"<BuildTransition {self.build_id} {self.version} {self.previous_state} -> {self.state}>"
+
+    @property
+    def done(self):
+        return self.state in TERMINAL_STATES
+
+
+class BuildWatcher:
+    # follows the processing state of builds, by id or by (app, version) for uploads that do
+    # not show up as builds yet, and yields one BuildTransition per state change:
+    #   watcher = BuildWatcher(api)
+    #   watcher.add_version('45', app_id=app_id)     # the build number of an upload
+    #   for transition in watcher.watch(timeout=3600): ...
+    # Every poll is one request per batch of watched builds, asking with sparse fields and
+    # filter[processingState] for the finished states only, so builds still processing are
+    # not even returned. The interval grows while nothing changes and the rate limit budget
+    # is spared when it runs low. Builds are dropped from the watch once VALID, FAILED or INVALID
+    def __init__(self, client, min_interval=15.0, max_interval=120.0, backoff=1.5):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self._states = {}  # build id -> last seen state, None until the first poll
+        self._versions = {}  # app id -> versions whose builds are not visible yet
+        self._lock = threading.Lock()
+
+    def add_build(self, build_id):
+        with self._lock:
+            self._states.setdefault(build_id, None)
+        return self
+
+    def add_version(self, version, app_id=None):
+        app_id = app_id or self.client.app_id
+        if not app_id or not version:
+            raise InvalidParameterException("'version' and 'app_id' are required for watching a build version")
+
+        with self._lock:
+            self._versions.setdefault(app_id, set()).add(str(version))
+        return self
+
+    @property
+    def pending(self):
+        with self._lock:
+            return {'builds': sorted(self._states), 'versions': {app_id: sorted(versions) for app_id, versions
+                                                                 in self._versions.items() if versions}}
+
+    def _has_pending(self):
+        with self._lock:
+            return bool(self._states) or any(self._versions.values())
+
+    def _queries(self):
+        with self._lock:
+            unseen = [build_id for build_id, state in self._states.items() if state is None]
+            processing = [build_id for build_id, state in self._states.items() if state is not None]
+            versions = {app_id: sorted(versions) for app_id, versions in self._versions.items() if versions}
+
+        # (app id, query) pairs, the app id is set for version lookups
+        queries = [(app_id, Query().filter('app', app_id).filter('version', values).fields('builds', FIELDS))
+                   for app_id, values in versions.items()]
+        for ids, states in ((unseen, None), (processing, TERMINAL_STATES)):
+            for start in range(0, len(ids), ID_BATCH):
+                query = Query().filter('id', ids[start:start + ID_BATCH]).fields('builds', FIELDS)
+                if states:
+                    query.filter('processingState', states)
+                queries.append((None, query))
+        return queries
+
+    def _apply(self, app_id, builds):
+        transitions = []
+        with self._lock:
+            if app_id is not None:
+                # every build of a watched version becomes a watched build, e.g. the iOS and the
+                # macOS upload of one build number; the number is dropped once all are taken
+                versions = self._versions.get(app_id, set())
+                found = set()
+                for build in builds:
+                    version = build['attributes'].get('version')
+                    if version in versions:
+                        self._states.setdefault(build['id'], None)
+                        found.add(version)
+                versions -= found
+
+            for build in builds:
+                if build['id'] not in self._states:
+                    continue
+                previous, state = self._states[build['id']], build['attributes'].get('processingState')
+                if state == previous:
+                    continue
+                transitions.append(BuildTransition(build['id'], build['attributes'].get('version'), previous, state,
+                                                   build))
+                if state in TERMINAL_STATES:
+                    del self._states[build['id']]
+                else:
+                    self._states[build['id']] = state
+        return transitions
+
+    def _next_interval(self, transitions):
+        # builds seen for the first time do not count as progress
+        changed = any(transition.previous_state is not None for transition in transitions)
+        self.interval = self.min_interval if changed else min(self.max_interval, self.interval * self.backoff)
+        interval = self.interval
+        limiter = self.client.rate_limiter
+        if limiter and limiter.limit and (limiter.available or 0) < limiter.limit * 0.1:
+            interval = self.max_interval
+        # jitter keeps watchers started together from polling in lockstep
+        return interval * random.uniform(0.9, 1.1)
+
+    def poll(self):
+        transitions = []
+        for app_id, query in self._queries():
+            transitions.extend(self._apply(app_id, list(self.client.iter_builds(query=query))))
+        return transitions
+
+    def watch(self, timeout=None):
+        # ends when every watched build is finished or after `timeout` seconds, `pending`
+        # tells what was still being watched
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._has_pending():
+            transitions = self.poll()
+            yield from transitions
+            if not self._has_pending():
+                return
+
+            delay = self._next_interval(transitions)
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return
+            time.sleep(delay)
+
+    async def apoll(self):
+        transitions = []
+        for app_id, query in self._queries():
+            builds = [build async for build in self.client.iter_builds(query=query)]
+            transitions.extend(self._apply(app_id, builds))
+        return transitions
+
+    async def awatch(self, timeout=None):
+        # watch() for AsyncAppStoreConnect
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._has_pending():
+            transitions = await self.apoll()
+            for transition in transitions:
+                yield transition
+            if not self._has_pending():
+                return
+
+            delay = self._next_interval(transitions)
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return
+            await asyncio.sleep(delay)
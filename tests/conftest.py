@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'src'), os.path.join(ROOT, 'benchmarks')]
+
+from bench_common import write_key
+from stub_server import StubServer
+
+from apple_api import AppStoreConnect, RetryPolicy
+
+
+@pytest.fixture(scope='session')
+def key_file(tmp_path_factory):
+    return write_key(str(tmp_path_factory.mktemp('keys')))
+
+
+@pytest.fixture
+def stub():
+    with StubServer(builds=250, apps=5, report_rows=500, record=True) as server:
+        yield server
+
+
+@pytest.fixture
+def api(stub, key_file):
+    with AppStoreConnect('KEY', key_file, 'issuer', app_id='app-1', base_api=stub.base_url,
+                         retry=RetryPolicy(backoff_factor=0.01)) as client:
+        yield client
+
+
+def issuer_of(authorization):
+    import jwt
+
+    return jwt.decode(authorization.split()[1], verify=False)['iss']
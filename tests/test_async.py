@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from apple_api import AsyncAppStoreConnect
+
+
+def _run(stub, key_file, body, **options):
+    async def main():
+        async with AsyncAppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url, **options) as api:
+            return await body(api)
+
+    return asyncio.run(main())
+
+
+def test_gather_and_pagination(stub, key_file):
+    async def body(api):
+        responses = await api.gather(api.get_subscription_group(f'sg-{number}') for number in range(5))
+        builds = [build async for build in api.iter_builds(limit=200)]
+        return responses, builds
+
+    responses, builds = _run(stub, key_file, body)
+    assert [response.json()['data']['id'] for response in responses] == [f'sg-{number}' for number in range(5)]
+    assert len(builds) == 250
+    assert len(stub.state.calls) == 5 + 2
+
+
+def test_requests_in_flight_are_bounded(stub, key_file):
+    stub.state.latency = 0.1
+
+    async def body(api):
+        started = time.perf_counter()
+        await api.map(api.get_subscription_group, [f'sg-{number}' for number in range(6)])
+        return time.perf_counter() - started
+
+    assert _run(stub, key_file, body, max_concurrency=2) >= 0.3
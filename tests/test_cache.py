@@ -0,0 +1,56 @@
+import pytest
+
+from apple_api import AppStoreConnect, MemoryBackend, ResponseCache, SQLiteBackend
+from apple_api.cache import endpoint_template, mutated_targets
+
+
+def test_endpoint_template():
+    assert endpoint_template('https://host/v2/inAppPurchases/6444/pricePoints?include=territory') == \
+        '/v2/inAppPurchases/{id}/pricePoints'
+    assert endpoint_template('/v1/apps') == '/v1/apps'
+
+
+def test_mutated_targets():
+    post_data = {'data': {'type': 'inAppPurchaseLocalizations', 'relationships': {
+        'inAppPurchaseV2': {'data': {'type': 'inAppPurchases', 'id': '42'}}}}}
+    assert mutated_targets('https://host/v1/inAppPurchaseLocalizations', post_data) == \
+        ({'inAppPurchaseLocalizations'}, {'42'})
+    assert mutated_targets('https://host/v1/subscriptions/7') == ({'subscriptions'}, {'7'})
+
+
+@pytest.mark.parametrize('make_backend', [lambda tmp_path: MemoryBackend(),
+                                          lambda tmp_path: SQLiteBackend(str(tmp_path / 'cache.db'))])
+def test_invalidation_matches_whole_path_segments(make_backend, tmp_path):
+    cache = ResponseCache(make_backend(tmp_path))
+    urls = ['https://host/v2/inAppPurchases/42/pricePoints', 'https://host/v2/inAppPurchases/420',
+            'https://host/v1/apps/1/inAppPurchasesV2', 'https://host/v1/subscriptions/42']
+    for url in urls:
+        cache.store(cache.key('issuer', url), url, 200, {}, b'{}')
+
+    cache.invalidate('https://host/v1/inAppPurchaseLocalizations',
+                     {'data': {'type': 'inAppPurchaseLocalizations', 'relationships': {
+                         'inAppPurchaseV2': {'data': {'type': 'inAppPurchases', 'id': '42'}}}}})
+
+    left = [url for url in urls if cache.get(cache.key('issuer', url))]
+    assert left == ['https://host/v2/inAppPurchases/420', 'https://host/v1/apps/1/inAppPurchasesV2']
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    for key in 'abc':
+        if key == 'c':
+            backend.get('a')
+        backend.set(key, {'content': b'x'})
+    assert [key for key in 'abc' if backend.get(key)] == ['a', 'c']
+
+
+def test_client_serves_cached_gets_until_a_write(stub, key_file):
+    with AppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url, cache=ResponseCache()) as api:
+        for _ in range(3):
+            assert api.get_subscription_group('sg-1').json()['data']['id'] == 'sg-1'
+        assert len(stub.state.calls) == 1
+
+        api.fetch('/v1/subscriptionGroups/sg-1', method='patch',
+                  post_data={'data': {'type': 'subscriptionGroups', 'id': 'sg-1', 'attributes': {}}})
+        api.get_subscription_group('sg-1')
+        assert [method for method, _, _ in stub.state.calls] == ['GET', 'PATCH', 'GET']
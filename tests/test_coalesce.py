@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from apple_api import AppStoreConnect, AsyncAppStoreConnect, ClientPool
+from apple_api.coalesce import AsyncSingleFlight, SingleFlight
+from conftest import issuer_of
+
+
+def _run_together(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_single_flight_shares_one_call():
+    flights, calls, results = SingleFlight(), [], []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'body'
+
+    _run_together(8, lambda: results.append(flights.do('key', fetch)))
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {'body'}
+
+
+def test_single_flight_shares_the_exception_and_forgets_the_call():
+    flights, errors = SingleFlight(), []
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flights.do('key', fail)
+        except ValueError as exc:
+            errors.append(exc)
+
+    _run_together(4, call)
+
+    assert len(errors) == 4 and len({id(exc) for exc in errors}) == 1
+    assert flights.do('key', lambda: 'fresh') == ('fresh', False)
+
+
+def test_single_flight_forget_starts_a_new_call():
+    flights, started, release = SingleFlight(), threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait()
+        return 'old'
+
+    thread = threading.Thread(target=flights.do, args=('key', slow))
+    thread.start()
+    started.wait()
+    flights.forget()
+    assert flights.do('key', lambda: 'new') == ('new', False)
+    release.set()
+    thread.join()
+
+
+def test_async_single_flight_survives_cancelling_the_leader():
+    async def main():
+        flights, calls = AsyncSingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'body'
+
+        leader = asyncio.ensure_future(flights.do('key', fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do('key', fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == ('body', True)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert len(calls) == 1
+
+    asyncio.run(main())
+
+
+@pytest.fixture
+def coalescing(stub, key_file):
+    with AppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url, coalesce=True) as client:
+        yield client
+
+
+@pytest.fixture
+def pool(stub, key_file):
+    with ClientPool([('KA', key_file, 'teamA'), ('KB', key_file, 'teamB')], base_api=stub.base_url,
+                    coalesce=True) as pool:
+        yield pool
+
+
+def test_clients_do_not_coalesce_by_default(api, stub):
+    stub.state.latency = 0.2
+    _run_together(3, lambda: api.get_subscription_group('sg-1'))
+    assert len(stub.state.calls) == 3
+
+
+def test_identical_concurrent_gets_are_coalesced(coalescing, stub):
+    stub.state.latency = 0.2
+    _run_together(6, lambda: coalescing.get_subscription_group('sg-1'))
+    assert len(stub.state.calls) == 1
+
+
+def test_streaming_gets_do_not_forget_reads_in_flight(coalescing, stub):
+    stub.state.latency = 0.5
+    thread = threading.Thread(target=coalescing.get_subscription_group, args=('sg-1',))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not stub.state.calls and time.monotonic() < deadline:  # the stub is now sleeping on it
+        time.sleep(0.01)
+    in_flight = dict(coalescing._flights._calls)
+
+    stub.state.latency = 0
+    list(coalescing.iter_sales_report_rows('111', '2023-01-01'))  # a streaming GET while the read is in flight
+    assert in_flight and coalescing._flights._calls == in_flight
+    thread.join()
+
+
+def test_writes_are_never_coalesced(coalescing, stub):
+    _run_together(3, lambda: coalescing.create_subscription_group('Pro'))
+    assert [method for method, _, _ in stub.state.calls] == ['POST'] * 3
+
+
+def test_async_client_coalesces(stub, key_file):
+    async def main():
+        async with AsyncAppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url, coalesce=True) as api:
+            return await api.gather(api.get_subscription_group('sg-1') for _ in range(5))
+
+    stub.state.latency = 0.1
+    responses = asyncio.run(main())
+    assert {response.json()['data']['id'] for response in responses} == {'sg-1'}
+    assert len(stub.state.calls) == 1
+
+
+def test_pinned_pool_callers_never_share_responses(pool, stub):
+    # the same url requested concurrently for two teams has to be sent once per team
+    stub.state.latency = 0.2
+    seen = {}
+
+    def call(team):
+        with pool.pinned(issuer_id=team):
+            seen[team] = issuer_of(pool.list_apps().request.headers['Authorization'])
+
+    threads = [threading.Thread(target=call, args=(team,)) for team in ('teamA', 'teamB')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {'teamA': 'teamA', 'teamB': 'teamB'}
+    assert sorted(issuer_of(authorization) for _, _, authorization in stub.state.calls) == ['teamA', 'teamB']
+
+
+def test_unpinned_pool_gets_are_coalesced(pool, stub):
+    stub.state.latency = 0.2
+    _run_together(4, pool.list_apps)
+    assert len(stub.state.calls) == 1
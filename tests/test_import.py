@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+HEAVY_MODULES = ('requests', 'jwt', 'aiohttp', 'cryptography', 'sqlite3', 'hashlib', 'concurrent.futures', 'orjson',
+                 'tempfile', 'logging')
+
+
+def test_import_and_construction_are_free(key_file):
+    # only what the import and the constructor add counts, site hooks may load e.g. tempfile at startup
+    code = ("import sys; sys.path.insert(0, 'src'); loaded = set(sys.modules); "
+            f"from apple_api import AppStoreConnect; AppStoreConnect('KEY', {key_file!r}, 'issuer'); "
+            f"print(sorted(name for name in {HEAVY_MODULES!r} if name in set(sys.modules) - loaded))")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True)
+    assert output.stdout.strip() == '[]'
+
+
+def test_endpoint_helpers_load_on_first_use(key_file):
+    code = ("import sys; sys.path.insert(0, 'src'); from apple_api import AppStoreConnect; "
+            f"api = AppStoreConnect('KEY', {key_file!r}, 'issuer'); api._generate_token(); "
+            "print('apple_api.tokens' in sys.modules, 'apple_api.uploads' in sys.modules)")
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, stdout=subprocess.PIPE, text=True)
+    assert output.stdout.split() == ['True', 'False']
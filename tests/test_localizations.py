@@ -0,0 +1,76 @@
+import pytest
+
+from apple_api.exceptions import InvalidParameterException
+from apple_api.localizations import IAP_FIELDS, SUBSCRIPTION_GROUP_FIELDS, diff_localizations
+
+EXISTING = [
+    {'id': 'l1', 'attributes': {'locale': 'en-US', 'name': 'Pass', 'description': '30 days'}},
+    {'id': 'l2', 'attributes': {'locale': 'de-DE', 'name': 'Pass', 'description': '30 Tage'}},
+]
+
+
+def test_diff_sends_only_changed_attributes():
+    diff = diff_localizations(EXISTING, {'en-US': {'name': 'Pass', 'description': '31 days'},
+                                         'fr-FR': {'name': 'Passe'}}, IAP_FIELDS)
+    assert diff.update == [('l1', 'en-US', {'description': '31 days'})]
+    assert diff.create == [('fr-FR', {'name': 'Passe'})]
+    assert diff.delete == [] and diff.unchanged == []
+
+
+def test_diff_leaves_missing_and_none_attributes_alone():
+    diff = diff_localizations(EXISTING, [{'locale': 'en-US', 'name': 'Pass', 'description': None},
+                                         {'locale': 'de-DE'}], IAP_FIELDS)
+    assert not diff
+    assert diff.unchanged == ['en-US', 'de-DE']
+
+
+def test_diff_deletes_only_when_asked():
+    assert diff_localizations(EXISTING, {}, IAP_FIELDS).delete == []
+    assert diff_localizations(EXISTING, {}, IAP_FIELDS, delete_missing=True).delete == [('l1', 'en-US'),
+                                                                                        ('l2', 'de-DE')]
+
+
+def test_diff_maps_field_names():
+    diff = diff_localizations([], {'en-US': {'name': 'Pro', 'custom_app_name': 'App', 'ignored': 1}},
+                              SUBSCRIPTION_GROUP_FIELDS)
+    assert diff.create == [('en-US', {'name': 'Pro', 'customAppName': 'App'})]
+
+
+def test_diff_rejects_bad_input():
+    with pytest.raises(InvalidParameterException):
+        diff_localizations([], [{'name': 'no locale'}], IAP_FIELDS)
+    with pytest.raises(InvalidParameterException):
+        diff_localizations([], [{'locale': 'en-US'}, {'locale': 'en-US'}], IAP_FIELDS)
+
+
+def test_upsert_without_changes_is_a_single_read(api, stub):
+    # the stub lists en-US, de-DE and fr-FR named '<type> <n>'
+    current = {locale: {'name': f'inAppPurchaseLocalizations {number}'}
+               for number, locale in enumerate(('en-US', 'de-DE', 'fr-FR'))}
+
+    summary = api.upsert_iap_purchase_localizations('iap-1', current)
+
+    assert summary['unchanged'] == ['en-US', 'de-DE', 'fr-FR']
+    assert [method for method, _, _ in stub.state.calls] == ['GET']
+
+
+def test_upsert_sends_minimal_writes(api, stub):
+    summary = api.upsert_subscription_group_localizations('sg-1', {
+        'en-US': {'name': 'subscriptionGroupLocalizations 0'},
+        'de-DE': {'name': 'Neu'},
+        'ja': {'name': 'Pro', 'custom_app_name': 'App'},
+    }, delete_missing=True)
+
+    assert (summary['created'], summary['updated'], summary['deleted']) == (['ja'], ['de-DE'], ['fr-FR'])
+    calls = sorted((method, path) for method, path, _ in stub.state.calls[1:])
+    assert calls == [('DELETE', '/v1/subscriptionGroupLocalizations/sg-1-subscriptionGroupLocalizations-2'),
+                     ('PATCH', '/v1/subscriptionGroupLocalizations/sg-1-subscriptionGroupLocalizations-1'),
+                     ('POST', '/v1/subscriptionGroupLocalizations')]
+
+
+def test_upsert_reports_failed_writes(api, stub):
+    stub.state.fail('POST', '/v1/inAppPurchaseLocalizations', 422)
+
+    summary = api.upsert_iap_purchase_localizations('iap-1', {'it': {'name': 'Passo'}})
+
+    assert list(summary['failed']) == ['it'] and summary['created'] == []
@@ -0,0 +1,76 @@
+import io
+
+import pytest
+
+from apple_api import MetricsCollector, RequestEvent
+from apple_api.metrics import body_size
+
+
+def _series(collector, kind, method, endpoint):
+    for series in collector.snapshot()['endpoints']:
+        if (series['kind'], series['method'], series['endpoint']) == (kind, method, endpoint):
+            return series
+    return None
+
+
+def test_body_size():
+    assert body_size(None) == 0 and body_size('é') == 2 and body_size(b'abc') == 3
+    assert body_size(memoryview(b'abcd')[1:]) == 3
+    assert body_size(io.BytesIO(b'x')) == 0
+
+
+def test_collector_aggregates_per_endpoint(api, stub):
+    collector = api.add_hook(MetricsCollector())
+    stub.state.fail('GET', '/v1/subscriptionGroups/sg-2', 429, times=1)
+    api.get_subscription_group('sg-1')
+    api.get_subscription_group('sg-2')
+    api.create_subscription_group('Pro')
+
+    reads = _series(collector, 'request', 'get', '/v1/subscriptionGroups/{id}')
+    assert reads['count'] == 2 and reads['retries'] == 1 and reads['statuses'] == {'200': 2}
+    assert reads['bytes_received'] > 0 and reads['latency_p50'] is not None
+    writes = _series(collector, 'request', 'post', '/v1/subscriptionGroups')
+    assert writes['count'] == 1 and writes['bytes_sent'] > 0 and writes['statuses'] == {'201': 1}
+    assert _series(collector, 'token', '', '')['count'] == 1
+    assert collector.snapshot()['rate_limit_remaining'] is not None
+
+
+def test_failed_requests_are_counted_as_errors(api, stub):
+    collector = api.add_hook(MetricsCollector())
+    api.base_api = 'http://127.0.0.1:1'
+    api.retry = None
+    with pytest.raises(Exception):
+        api.get_subscription_group('sg-1')
+    assert _series(collector, 'request', 'get', '/v1/subscriptionGroups/{id}')['statuses'] == {'error': 1}
+
+
+def test_a_failing_hook_never_fails_the_request(api):
+    def hook(event):
+        raise RuntimeError('broken exporter')
+
+    api.add_hook(hook)
+    with pytest.warns(UserWarning, match='broken exporter'):
+        assert api.get_subscription_group('sg-1').status_code == 200
+    api.remove_hook(hook)
+    assert api.hooks == []
+
+
+def test_prometheus_export():
+    collector = MetricsCollector(prefix='asc')
+    for latency in (0.004, 0.2, 0.2, 40):
+        collector(RequestEvent('request', 'get', '/v1/apps/{id}', status_code=200, latency=latency,
+                               rate_limit_remaining=99))
+    exported = []
+    snapshot = collector.export(exported.append, reset=True)
+
+    assert exported == [snapshot] and collector.snapshot()['endpoints'] == []
+    series = snapshot['endpoints'][0]
+    assert series['latency_p50'] == 0.25 and series['latency_p99'] == float('inf')
+
+    collector(RequestEvent('request', 'get', '/v1/apps/{id}', status_code=200, latency=0.2,
+                           rate_limit_remaining=99))
+    text = collector.to_prometheus()
+    labels = 'kind="request",method="get",endpoint="/v1/apps/{id}"'
+    assert f'asc_request_duration_seconds_bucket{{{labels},le="0.25"}} 1' in text
+    assert f'asc_responses_total{{{labels},status="200"}} 1' in text
+    assert text.endswith('asc_rate_limit_remaining 99\n')
@@ -0,0 +1,73 @@
+import pytest
+
+from apple_api import CatalogMirror
+from apple_api import mirror as mirror_module
+
+
+@pytest.fixture
+def mirror(api, tmp_path):
+    with CatalogMirror(api, str(tmp_path / 'catalog.db')) as mirror:
+        yield mirror
+
+
+def test_sync_mirrors_the_catalog(mirror, stub):
+    stats = mirror.sync()
+
+    assert stats == {'apps': 5, 'inAppPurchases': 15, 'subscriptionGroups': 15, 'subscriptions': 45, 'builds': 250}
+    assert [app.id for app in mirror.find('apps', bundleId='com.example.app3')] == ['app-3']
+    assert len(mirror.in_app_purchases('app-1')) == 3 and len(mirror.subscriptions('app-1-subscriptionGroups-0')) == 3
+    # builds carry their app, 250 builds over 5 apps
+    assert len(mirror.builds('app-2')) == 50 and len(mirror.related('apps', 'app-2', 'app')) == 50
+    assert len(mirror.builds(processing_state='PROCESSING')) == 50
+    assert mirror.get('builds', 'build-7')['version'] == '7'
+
+
+def test_fresh_collections_are_not_fetched_again(mirror, stub):
+    mirror.sync()
+    stub.state.calls.clear()
+    stats = mirror.sync()
+
+    assert 'apps' not in stats and stats['inAppPurchases'] == stats['subscriptions'] == 0
+    assert all('/v1/builds' in path for _, path, _ in stub.state.calls)
+
+
+def test_full_sync_removes_resources_that_are_gone(mirror, stub):
+    mirror.sync()
+    stub.state.apps = 3
+    mirror.sync(full=True)
+    assert sorted(app.id for app in mirror.apps()) == ['app-0', 'app-1', 'app-2']
+
+
+def test_builds_are_written_in_batches(mirror, stub, monkeypatch):
+    monkeypatch.setattr(mirror_module, 'WRITE_BATCH', 40)
+    batches = []
+    write = mirror._write
+    monkeypatch.setattr(mirror, '_write', lambda resources, parent_id, now: batches.append(len(resources)) or
+                        write(resources, parent_id, now))
+
+    assert mirror.sync_builds(full=True) == 250
+    assert batches == [40] * 6 + [10]
+
+
+def test_interrupted_build_sync_keeps_its_progress(mirror, stub, monkeypatch):
+    monkeypatch.setattr(mirror_module, 'WRITE_BATCH', 50)
+    stub.state.fail('GET', 'cursor=200', 500)
+    with pytest.raises(Exception):
+        mirror.sync_builds()
+
+    assert len(mirror.builds()) == 200
+    assert mirror._state('builds') is None  # no watermark, the next sync starts over
+
+    stub.state.faults.clear()
+    assert mirror.sync_builds() == 250
+    assert mirror._state('builds')[1] == '2023-01-01T04:09:00+00:00'  # the newest build
+
+
+def test_incremental_build_sync_stops_at_the_watermark(mirror, stub):
+    stub.state.builds = 2000
+    mirror.sync_builds()
+    stub.state.calls.clear()
+
+    # six hours of overlap at one build per minute, then the 328 older builds still processing by id
+    assert mirror.sync_builds() == 361 + 328
+    assert len(stub.state.calls) == 2 + 1 + 7  # the third page was prefetched
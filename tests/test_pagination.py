@@ -0,0 +1,61 @@
+import time
+
+from apple_api.pagination import iter_pages, iter_resources
+
+
+def _pages(count):
+    return {f'/page/{number}': {'data': [{'id': f'{number}-{item}'} for item in range(2)],
+                                'links': {'next': f'/page/{number + 1}'} if number + 1 < count else {}}
+            for number in range(count)}
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_iter_pages_follows_next_links():
+    pages = _pages(3)
+    assert list(iter_pages(pages.get, '/page/0', prefetch=False)) == list(pages.values())
+    assert [resource['id'] for resource in iter_resources(pages.get, '/page/0')] == \
+           ['0-0', '0-1', '1-0', '1-1', '2-0', '2-1']
+
+
+def test_iter_pages_prefetches_one_page_ahead():
+    pages = _pages(5)
+    fetched = []
+
+    def fetch_page(uri):
+        fetched.append(uri)
+        return pages[uri]
+
+    iterator = iter_pages(fetch_page, '/page/0')
+    next(iterator)
+    assert _wait_for(lambda: len(fetched) == 2)
+    time.sleep(0.05)
+    assert fetched == ['/page/0', '/page/1']  # never more than one page ahead
+    iterator.close()
+
+
+def test_iter_builds_follows_every_page(api, stub):
+    builds = list(api.iter_builds(limit=100))
+    assert len(builds) == 250 and len({build['id'] for build in builds}) == 250
+    assert [path.split('?')[1] for _, path, _ in stub.state.calls] == ['limit=100', 'cursor=100&limit=100',
+                                                                       'cursor=200&limit=100']
+
+
+def test_stopping_early_fetches_at_most_one_more_page(api, stub):
+    for build in api.iter_builds(limit=50):
+        break
+    _wait_for(lambda: len(stub.state.calls) == 2)
+    time.sleep(0.05)
+    assert len(stub.state.calls) == 2
+
+
+def test_prefetch_can_be_turned_off(api, stub):
+    pages = api.iter_pages('/v1/builds', limit=50, prefetch=False)
+    next(pages)
+    time.sleep(0.05)
+    assert len(stub.state.calls) == 1
@@ -0,0 +1,73 @@
+import pytest
+
+from apple_api import AppStoreConnect, ClientPool
+from apple_api.exceptions import InvalidParameterException
+from conftest import issuer_of
+
+
+@pytest.fixture
+def pool(stub, key_file):
+    with ClientPool([('KA', key_file, 'teamA'), {'key_id': 'KB', 'key_file': key_file, 'issuer_id': 'teamB'}],
+                    write_key_id='KB', base_api=stub.base_url) as pool:
+        yield pool
+
+
+def _issuers(stub):
+    return [issuer_of(authorization) for _, _, authorization in stub.state.calls]
+
+
+def test_routes_to_the_key_with_most_budget(pool, stub):
+    pool.clients[0].rate_limiter.update({'X-Rate-Limit': 'user-hour-lim:3600;user-hour-rem:10;'})
+    pool.clients[1].rate_limiter.update({'X-Rate-Limit': 'user-hour-lim:3600;user-hour-rem:3000;'})
+    pool.get_subscription_group('sg-1')
+    with pool.pinned(key_id='KA'):
+        pool.get_subscription_group('sg-2')
+
+    assert _issuers(stub) == ['teamB', 'teamA']
+
+
+def test_writes_go_to_the_write_key(pool, stub):
+    pool.clients[0].rate_limiter.update({'X-Rate-Limit': 'user-hour-lim:3600;user-hour-rem:3000;'})
+    pool.clients[1].rate_limiter.update({'X-Rate-Limit': 'user-hour-lim:3600;user-hour-rem:10;'})
+    pool.create_subscription_group('Pro')
+
+    assert _issuers(stub) == ['teamB']
+
+
+def test_pin_reaches_worker_threads(pool, stub):
+    # page prefetching and the localization fan-out run on worker threads
+    with pool.pinned(issuer_id='teamA'):
+        assert len(list(pool.iter_builds(limit=50))) == 250
+        summary = pool.upsert_iap_purchase_localizations('iap-1', [
+            {'locale': 'en-US', 'name': 'Month'}, {'locale': 'it', 'name': 'Mese'}, {'locale': 'ja', 'name': 'Tsuki'}])
+
+    assert sorted(summary['created']) == ['it', 'ja'] and summary['updated'] == ['en-US']
+    methods = [method for method, _, _ in stub.state.calls]
+    assert methods.count('GET') == 6 and methods.count('POST') == 2 and methods.count('PATCH') == 1
+    assert set(_issuers(stub)) == {'teamA'}
+
+
+def test_writes_stay_in_the_pinned_team(pool, stub):
+    # the write key KB belongs to teamB
+    with pool.pinned(key_id='KA'):
+        pool.create_subscription_group('Pro')
+    with pool.pinned(issuer_id='teamA'):
+        pool.create_subscription_group('Pro')
+    with pool.pinned(issuer_id='teamB'):
+        pool.create_subscription_group('Pro')
+
+    assert _issuers(stub) == ['teamA', 'teamA', 'teamB']
+
+
+def test_pool_shares_adapter_and_debug_with_its_keys(pool):
+    pool._debug = True
+    assert all(client._debug for client in pool.clients)
+    assert all(client.adapter is pool.adapter for client in pool.clients)
+    assert isinstance(pool, AppStoreConnect) and pool.timeout is None
+
+
+def test_invalid_pool_configuration(key_file):
+    with pytest.raises(InvalidParameterException):
+        ClientPool([])
+    with pytest.raises(InvalidParameterException):
+        ClientPool([('KA', key_file, 'teamA')], write_key_id='KZ')
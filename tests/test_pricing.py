@@ -0,0 +1,79 @@
+import os
+import time
+from urllib.parse import unquote
+
+import pytest
+
+from apple_api import PricePointIndex, PricePointStore
+from apple_api.exceptions import InvalidParameterException
+from apple_api.pricing import TerritoryPrices, price_key
+from stub_server import TERRITORIES
+
+
+def _price_point_calls(stub):
+    return [unquote(path) for _, path, _ in stub.state.calls if '/pricePoints' in path]
+
+
+def test_price_keys_are_exact():
+    assert price_key('0.99') == price_key(0.99) == 990
+    assert price_key('1999') == 1999000
+
+
+def test_territory_prices_lookup():
+    prices = TerritoryPrices.from_points([(price_key('1.99'), 'b', '2'), (price_key('0.99'), 'a', '1'),
+                                         (price_key('0'), 'free', None)])
+    assert prices.by_price('0.99') == 'a' and prices.by_price('1.990') == 'b' and prices.by_price('0') == 'free'
+    assert prices.by_price('1.49') is None
+    assert prices.by_tier(2) == 'b' and prices.by_tier('9') is None
+
+
+def test_every_territory_is_fetched_once_and_saved_once(api, stub, tmp_path, monkeypatch):
+    saves = []
+    save = PricePointIndex.save
+    monkeypatch.setattr(PricePointIndex, 'save', lambda index, path: saves.append(path) or save(index, path))
+    store = PricePointStore(api, str(tmp_path))
+
+    territories = stub.state.territories
+    found = [store.find('iap-1', territory, customer_price='4.99') for territory in territories]
+
+    assert found == [f'iap-1-{territory}-4' for territory in territories]
+    # 175 territories x 100 tiers in pages of 8000
+    assert len(_price_point_calls(stub)) == 3 and len(saves) == 1
+    assert os.listdir(tmp_path) == ['iap-1.json']
+
+
+def test_lookups_are_answered_from_disk(api, stub, tmp_path):
+    PricePointStore(api, str(tmp_path)).find('iap-1', 'USA', tier=1)
+    stub.state.calls.clear()
+
+    store = PricePointStore(api, str(tmp_path))
+    assert store.find('iap-1', 'DEU', tier=10) == 'iap-1-DEU-9'
+    assert store.find('iap-1', 'JPN', customer_price='0.99') == 'iap-1-JPN-0'
+    assert store.find('iap-1', 'JPN', customer_price='0.98') is None
+    assert _price_point_calls(stub) == []
+
+
+def test_only_stale_territories_are_fetched_again(api, stub, tmp_path):
+    PricePointStore(api, str(tmp_path)).find('iap-1', 'USA', tier=1)
+    index = PricePointIndex.load(str(tmp_path / 'iap-1.json'))
+    index.territories['DEU'].updated_at = time.time() - 3600
+    index.save(str(tmp_path / 'iap-1.json'))
+    stub.state.calls.clear()
+
+    PricePointStore(api, str(tmp_path), max_age=60).find('iap-1', 'USA', tier=1)
+    assert _price_point_calls(stub) == ['/v2/inAppPurchases/iap-1/pricePoints?include=territory'
+                                        '&filter[territory]=DEU&limit=8000']
+
+
+def test_unknown_territory_is_not_fetched_again(api, stub, tmp_path):
+    store = PricePointStore(api, str(tmp_path))
+    store.find('iap-1', 'USA', tier=1)
+    with pytest.raises(InvalidParameterException):
+        store.find('iap-1', 'XXX', tier=1)
+    assert len(_price_point_calls(stub)) == 3
+
+
+def test_partial_index_is_completed(api, stub, tmp_path):
+    PricePointIndex.build(api, 'iap-1', TERRITORIES[:2]).save(str(tmp_path / 'iap-1.json'))
+    assert PricePointStore(api, str(tmp_path)).find('iap-1', 'JPN', tier=1) == 'iap-1-JPN-0'
+    assert PricePointIndex.load(str(tmp_path / 'iap-1.json')).complete
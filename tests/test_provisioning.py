@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from apple_api import Provisioner
+from apple_api.exceptions import InvalidParameterException
+
+
+class Prices:
+    def find(self, iap_id, territory, customer_price=None, tier=None):
+        return 'pp-1' if customer_price == '0.99' else None
+
+
+PRODUCTS = [
+    {'product_id': 'pass.month', 'name': 'Month', 'submit': True,
+     'localizations': [{'locale': 'en-US', 'name': 'Month'}, {'locale': 'de-DE', 'name': 'Monat'}],
+     'price': {'territory': 'USA', 'customer_price': '0.99'}},
+    {'product_id': 'pro.year', 'type': 'AUTO_RENEWABLE_SUBSCRIPTION', 'name': 'Pro yearly',
+     'subscription_group': {'name': 'Pro'}, 'subscription_period': 'ONE_YEAR', 'group_level': 1},
+    {'product_id': 'pro.month', 'type': 'AUTO_RENEWABLE_SUBSCRIPTION', 'name': 'Pro monthly',
+     'subscription_group': {'name': 'Pro'}, 'subscription_period': 'ONE_MONTH', 'group_level': 2},
+]
+
+
+def _provisioner(api, tmp_path, products=PRODUCTS):
+    return Provisioner(api, products, str(tmp_path / 'checkpoint.json'), max_workers=4, price_points=Prices())
+
+
+def _posts(stub):
+    return [path for method, path, _ in stub.state.calls if method == 'POST']
+
+
+def test_plan():
+    provisioner = Provisioner(None, PRODUCTS, '/nonexistent/checkpoint.json', price_points=Prices())
+    assert provisioner.steps['pass.month:submit'].deps == ('pass.month:create', 'pass.month:localization:en-US',
+                                                          'pass.month:localization:de-DE', 'pass.month:price')
+    # the group is created once for both subscriptions
+    assert provisioner.steps['pro.year:create'].deps == provisioner.steps['pro.month:create'].deps == ('group:Pro',)
+
+
+@pytest.mark.parametrize('product', [{'name': 'no id'}, {'product_id': 'x', 'name': 'X', 'type': 'BUNDLE'},
+                                     {'product_id': 'x', 'name': 'X', 'type': 'AUTO_RENEWABLE_SUBSCRIPTION'}])
+def test_plan_rejects_invalid_products(product):
+    with pytest.raises(InvalidParameterException):
+        Provisioner(None, [product], '/nonexistent/checkpoint.json', price_points=Prices())
+
+
+def test_run_orders_steps_and_resumes_from_checkpoint(api, stub, tmp_path):
+    stub.state.fail('POST', '/v1/subscriptionGroups', 500, times=1)  # POSTs are not retried
+
+    summary = _provisioner(api, tmp_path).run()
+
+    assert set(summary['failed']) == {'group:Pro'}
+    assert sorted(summary['blocked']) == ['pro.month:create', 'pro.year:create']
+    posts = _posts(stub)
+    assert posts.index('/v1/inAppPurchaseLocalizations') > posts.index('/v2/inAppPurchases')
+    assert posts.index('/v1/inAppPurchaseSubmissions') > posts.index('/v1/inAppPurchasePriceSchedules')
+    with open(tmp_path / 'checkpoint.json') as file:
+        assert 'pass.month:submit' in json.load(file)['steps']
+
+    stub.state.calls.clear()
+    summary = _provisioner(api, tmp_path).run()
+
+    assert summary['failed'] == {} and summary['blocked'] == []
+    assert sorted(summary['completed']) == ['group:Pro', 'pro.month:create', 'pro.year:create']
+    assert sorted(_posts(stub)) == ['/v1/subscriptionGroups', '/v1/subscriptions', '/v1/subscriptions']
+
+
+def test_unknown_price_fails_before_writing(api, stub, tmp_path):
+    product = dict(PRODUCTS[0], price={'territory': 'USA', 'customer_price': '7.77'}, submit=False,
+                   localizations=[])
+
+    summary = _provisioner(api, tmp_path, [product]).run()
+
+    error = summary['failed']['pass.month:price']
+    assert isinstance(error, InvalidParameterException) and "'pass.month'" in str(error) and '7.77' in str(error)
+    assert '/v1/inAppPurchasePriceSchedules' not in _posts(stub)
@@ -0,0 +1,32 @@
+from apple_api import Query
+from apple_api.query import add_query, as_query
+
+
+def test_query_encodes_json_api_parameters():
+    query = (Query().fields('builds', 'version', 'processingState').filter('app', 'app-1')
+             .include('app').sort('-uploadedDate').limit(10, 'individualTesters'))
+    assert query.encode() == ('fields[builds]=version,processingState&filter[app]=app-1&include=app'
+                              '&sort=-uploadedDate&limit[individualTesters]=10')
+    assert Query(filter={'id': ['1', '2']}, limit=5).apply('/v1/builds?sort=version') == \
+        '/v1/builds?sort=version&filter[id]=1,2&limit=5'
+
+
+def test_none_removes_a_parameter():
+    query = Query().filter('app', 'app-1').filter('app', None)
+    assert not query and Query().apply('/v1/apps') == '/v1/apps'
+
+
+def test_add_query_keeps_the_callers_parameters():
+    query = Query().limit(20)
+    assert add_query('/v1/apps', query, limit=200) == '/v1/apps?limit=20'
+    assert add_query('/v1/apps', {'filter[name]': 'App'}, limit=200) == '/v1/apps?filter[name]=App&limit=200'
+    # the caller's query is copied, never changed
+    empty = Query()
+    assert add_query('/v1/apps', empty, limit=200) == '/v1/apps?limit=200' and not empty
+    assert as_query(query) is not query and as_query(query).encode() == query.encode()
+
+
+def test_query_reaches_the_server(api):
+    query = Query().filter('id', ['build-1', 'build-2']).fields('builds', ['version'])
+    builds = list(api.iter_builds(query=query))
+    assert [build['attributes'] for build in builds] == [{'version': '1'}, {'version': '2'}]
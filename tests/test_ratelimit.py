@@ -0,0 +1,59 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from apple_api.ratelimit import RateLimiter, RetryPolicy, parse_rate_limit, parse_retry_after
+
+
+def test_parse_rate_limit():
+    assert parse_rate_limit('user-hour-lim:3600;user-hour-rem:3599;') == (3600, 3599)
+    assert parse_rate_limit('garbage') == (None, None)
+    assert parse_rate_limit(None) == (None, None)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_rate_limiter_paces_once_the_budget_is_spent():
+    limiter = RateLimiter()
+    assert limiter.acquire() == 0.0 and limiter.available is None
+
+    limiter.update({'X-Rate-Limit': 'user-hour-lim:3600;user-hour-rem:2;'})
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(1.0, abs=0.01)  # one request per second at 3600/h
+
+
+def test_rate_limiter_reserve_and_exhaust():
+    limiter = RateLimiter(hourly_limit=3600, reserve=10)
+    assert limiter.available == pytest.approx(3590, abs=1)
+
+    limiter.exhaust()
+    assert limiter.remaining == 0
+    assert limiter.acquire() == pytest.approx(11.0, abs=0.05)
+
+
+def test_retry_policy():
+    policy = RetryPolicy(max_retries=2, backoff_factor=1, max_backoff=5)
+    assert policy.should_retry_response('post', 429, 0)
+    assert not policy.should_retry_response('post', 503, 0)
+    assert policy.should_retry_response('get', 503, 1)
+    assert not policy.should_retry_response('get', 503, 2)
+    assert not policy.should_retry_response('get', 404, 0)
+    assert policy.should_retry_error('delete', 0) and not policy.should_retry_error('post', 0)
+
+    assert policy.backoff(0, '120') == 5
+    assert all(0 <= policy.backoff(3) <= 5 for _ in range(50))
+
+
+def test_client_retries_throttled_requests(api, stub):
+    stub.state.fail('GET', '/v1/subscriptionGroups/sg-1', 429, times=2)
+
+    assert api.get_subscription_group('sg-1').status_code == 200
+    assert [path for _, path, _ in stub.state.calls].count('/v1/subscriptionGroups/sg-1') == 3
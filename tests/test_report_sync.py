@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+import pytest
+
+from apple_api import ReportSync
+from apple_api.exceptions import InvalidParameterException
+from apple_api.report_sync import period_end, report_dates
+
+
+def test_report_dates():
+    assert report_dates('2023-01-30', '2023-02-02') == ['2023-01-30', '2023-01-31', '2023-02-01', '2023-02-02']
+    # weeks are addressed by their sunday
+    assert report_dates('2023-01-02', '2023-01-16', 'WEEKLY') == ['2023-01-08', '2023-01-15']
+    assert report_dates('2022-11-15', '2023-02-01', 'MONTHLY') == ['2022-11', '2022-12', '2023-01', '2023-02']
+    assert report_dates(date(2021, 5, 1), date(2023, 1, 1), 'YEARLY') == ['2021', '2022', '2023']
+    with pytest.raises(InvalidParameterException):
+        report_dates('2023-01-01', '2023-01-02', 'HOURLY')
+
+
+def test_period_end():
+    assert period_end('2023-01-31', 'DAILY') == date(2023, 2, 1)
+    assert period_end('2023-12', 'MONTHLY') == date(2024, 1, 1)
+    assert period_end('2023', 'YEARLY') == date(2024, 1, 1)
+
+
+def test_report_sync_stores_rows_and_resumes(api, stub, tmp_path):
+    stub.state.fail('GET', 'reportDate]=2023-01-02', 404)
+    stub.state.fail('GET', 'reportDate]=2023-01-03', 500)
+
+    with ReportSync(api, str(tmp_path / 'reports.db'), max_workers=2) as sync:
+        summary = sync.sync_sales('111', '2023-01-01', '2023-01-03')
+        assert (summary['fetched'], summary['rows'], summary['empty']) == (1, 500, 1)
+        assert [job.report_date for job, _ in summary['failed']] == ['2023-01-03']
+        # nothing of the failed report was written
+        assert sync.query("SELECT report_date, COUNT(*) FROM sales_summary_daily GROUP BY 1") == [('2023-01-01', 500)]
+
+        stub.state.faults.clear()
+        summary = sync.sync_sales('111', '2023-01-01', '2023-01-03')
+        # the settled empty day and the stored one are skipped, only the failure is fetched
+        assert (summary['skipped'], summary['fetched'], summary['failed']) == (2, 1, [])
+        assert sync.query("SELECT SUM(units) FROM sales_summary_daily")[0][0] == 2 * sum(i % 7 + 1 for i in range(500))
+
+
+def test_report_sync_asks_again_for_recent_empty_days(api, stub, tmp_path):
+    today = date.today()
+    stub.state.fail('GET', 'reportDate]=', 404)
+
+    with ReportSync(api, str(tmp_path / 'reports.db')) as sync:
+        assert sync.sync_sales('111', today - timedelta(days=1), today)['empty'] == 2
+        assert sync.sync_sales('111', today - timedelta(days=1), today)['skipped'] == 0
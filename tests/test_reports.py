@@ -0,0 +1,48 @@
+import asyncio
+import gzip
+
+import pytest
+
+from apple_api import AsyncAppStoreConnect
+from apple_api.reports import iter_tsv_rows
+
+TSV = 'Title\tUnits\r\nCafé ☕\t3\n\nNaïve\t4\n'.encode('utf-8')
+
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 4096])
+def test_tsv_rows_survive_any_chunking(size):
+    # lines, multi-byte characters and gzip members split across chunk boundaries
+    archive = gzip.compress(TSV[:20]) + gzip.compress(TSV[20:])
+    assert list(iter_tsv_rows(_chunks(archive, size))) == [{'Title': 'Café ☕', 'Units': '3'},
+                                                           {'Title': 'Naïve', 'Units': '4'}]
+
+
+def test_tsv_last_line_without_newline():
+    assert list(iter_tsv_rows([gzip.compress(b'a\tb\n1\t2')])) == [{'a': '1', 'b': '2'}]
+
+
+def test_iter_sales_report_rows(api):
+    rows = list(api.iter_sales_report_rows('111', '2023-01-01'))
+    assert len(rows) == 500
+    assert rows[0]['SKU'] == 'sku.0' and rows[-1]['Units'] == str(499 % 7 + 1)
+
+
+def test_download_report(api, stub, tmp_path):
+    uri = '/v1/salesReports?filter[vendorNumber]=111'
+    assert api.download_report(uri, str(tmp_path / 'report.tsv')) == str(tmp_path / 'report.tsv')
+    assert (tmp_path / 'report.tsv').read_bytes() == gzip.decompress(stub.state.report)
+    api.download_report(uri, str(tmp_path / 'report.tsv.gz'), decompress=False)
+    assert (tmp_path / 'report.tsv.gz').read_bytes() == stub.state.report
+
+
+def test_async_report_rows_stream(stub, key_file):
+    async def main():
+        async with AsyncAppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url) as api:
+            return [row async for row in api.iter_sales_report_rows('111', '2023-01-01')]
+
+    rows = asyncio.run(main())
+    assert len(rows) == 500 and rows[0]['SKU'] == 'sku.0'
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from apple_api import Document, Resource
+
+PAYLOAD = {
+    'data': [
+        {'type': 'inAppPurchasePrices', 'id': 'p1', 'attributes': {'manual': True},
+         'relationships': {
+             'territory': {'links': {'related': '/territory'}, 'data': {'type': 'territories', 'id': 'USA'}},
+             'inAppPurchasePricePoint': {'data': {'type': 'inAppPurchasePricePoints', 'id': 'pp1'}},
+             'inAppPurchaseV2': {'links': {'related': '/iap'}}}},
+        {'type': 'inAppPurchasePrices', 'id': 'p2', 'attributes': {'manual': False},
+         'relationships': {'territory': {'data': {'type': 'territories', 'id': 'DEU'}}}},
+    ],
+    'included': [
+        {'type': 'territories', 'id': 'USA', 'attributes': {'currency': 'USD'}},
+        {'type': 'inAppPurchasePricePoints', 'id': 'pp1', 'attributes': {'customerPrice': '0.99'}},
+    ],
+    'links': {'self': '/prices', 'next': '/prices?cursor=2'},
+    'meta': {'paging': {'total': 2}},
+}
+
+
+@pytest.fixture
+def document():
+    return Document(content=json.dumps(PAYLOAD).encode('utf-8'))
+
+
+def test_document_parses_lazily(document):
+    assert document._included is None
+    assert len(document) == 2 and document.next_url == '/prices?cursor=2'
+    assert document.meta == {'paging': {'total': 2}}
+    assert document._content is None  # released once indexed
+
+
+def test_attribute_access(document):
+    price = document.data[0]
+    assert price['manual'] is True and price.manual is True and price.get('missing', 1) == 1
+    assert price.attributes == {'manual': True}
+    with pytest.raises(AttributeError):
+        price.missing
+    with pytest.raises(KeyError):
+        price['missing']
+
+
+def test_relationships_resolve_against_included(document):
+    first, second = document
+    assert first.related('territory').currency == 'USD'
+    assert first.related('inAppPurchasePricePoint')['customerPrice'] == '0.99'
+    assert first.related('inAppPurchaseV2') is None  # links only
+    # not included: a bare resource with type and id
+    assert second.related('territory') == Resource({'type': 'territories', 'id': 'DEU'})
+    assert second.related_ids('territory') == [('territories', 'DEU')]
+    assert first.relationships['territory'] == {'data': {'type': 'territories', 'id': 'USA'}}
+
+
+def test_single_resource_document():
+    document = Document(raw={'data': {'type': 'apps', 'id': '1', 'attributes': {'name': 'App'}}})
+    assert document.data.name == 'App' and list(document) == [document.data]
+    assert len(Document(raw={'data': None})) == 0
@@ -0,0 +1,41 @@
+import gc
+import threading
+
+import pytest
+
+from apple_api.exceptions import MethodNotAllowedException
+
+
+def _run_together(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_threads_share_one_connection_pool(api):
+    sessions = []
+    _run_together(4, lambda: sessions.append(api._session))
+    assert len(set(map(id, sessions))) == 4
+    assert all(session.get_adapter(api.base_api) is api.adapter for session in sessions)
+
+
+def test_sessions_do_not_outlive_their_threads(api):
+    for _ in range(10):
+        list(api.iter_builds(limit=50))  # every iterator prefetches on a thread of its own
+    _run_together(10, lambda: api.get_subscription_group('sg-1'))
+    gc.collect()
+    assert len(api._sessions) <= 1
+
+
+def test_keep_alive_can_be_turned_off(api):
+    api.keep_alive = False
+    assert api.get_subscription_group('sg-1').request.headers['Connection'] == 'close'
+
+
+def test_closed_client_refuses_requests(api):
+    api.get_subscription_group('sg-1')
+    api.close()
+    with pytest.raises(MethodNotAllowedException):
+        api.get_subscription_group('sg-1')
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from urllib.parse import unquote
+
+import pytest
+
+from apple_api.signing import MANIFEST, write_atomic
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return tmp_path / 'signing'
+
+
+def _certificate_content(number):
+    return hashlib.sha256(f'certificate {number}'.encode()).digest() * 32
+
+
+def test_write_atomic_replaces_without_leftovers(tmp_path):
+    path = str(tmp_path / 'file.bin')
+    write_atomic(path, b'old')
+    write_atomic(path, b'new')
+    assert os.listdir(tmp_path) == ['file.bin'] and (tmp_path / 'file.bin').read_bytes() == b'new'
+
+
+def test_sync_downloads_only_missing_assets(api, stub, directory):
+    stats = api.sync_signing_assets(str(directory))
+
+    assert stats['certificates'] == {'written': 10, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+    assert stats['profiles']['written'] == 40
+    assert (directory / f'{3:016X}.cer').read_bytes() == _certificate_content(3)
+    assert (directory / '00000000-0000-0000-0000-000000000007.mobileprovision').exists()
+    # two listings and one filter[id] batch per kind, the listings leave out the content
+    assert len(stub.state.calls) == 4
+
+    stub.state.calls.clear()
+    stats = api.sync_signing_assets(str(directory))
+    assert stats['certificates']['skipped'] == 10 and stats['profiles']['skipped'] == 40
+    assert len(stub.state.calls) == 2
+
+
+def test_prune_only_removes_files_of_the_sync(api, stub, directory):
+    directory.mkdir()
+    (directory / 'notes.cer').write_bytes(b'mine')
+    api.sync_signing_assets(str(directory))
+    api.download_certificate('cert-1', str(directory))
+    assert (directory / 'Distribution 1.cer').read_bytes() == _certificate_content(1)
+
+    stub.state.certificates = 8
+    stats = api.sync_signing_assets(str(directory), profiles=False, prune=True)
+
+    assert stats['certificates']['removed'] == 2
+    certificates = sorted(name for name in os.listdir(directory) if name.endswith('.cer'))
+    assert certificates == [f'{number:016X}.cer' for number in range(8)] + ['Distribution 1.cer', 'notes.cer']
+    # profiles were not synced this time, their files stay owned by the sync
+    manifest = (directory / MANIFEST).read_text()
+    assert '00000000-0000-0000-0000-000000000039.mobileprovision' in manifest
+
+
+def test_a_deleted_file_is_fetched_again_alone(api, stub, directory):
+    api.sync_signing_assets(str(directory), profiles=False)
+    os.remove(directory / f'{2:016X}.cer')
+    stub.state.calls.clear()
+
+    assert api.sync_signing_assets(str(directory), profiles=False)['certificates']['written'] == 1
+    assert (directory / f'{2:016X}.cer').read_bytes() == _certificate_content(2)
+    assert 'filter[id]=cert-2&' in unquote(stub.state.calls[-1][1])
@@ -0,0 +1,73 @@
+import os
+import shutil
+import stat
+import time
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from apple_api import AppStoreConnect, FileTokenStore, MemoryTokenStore
+from apple_api.tokens import TOKEN_LIFETIME, load_signing_key
+from bench_common import write_key
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_signing_key_is_parsed_once_per_file_version(tmp_path):
+    path = write_key(str(tmp_path))
+    key = load_signing_key(path)
+    assert load_signing_key(path) is key
+
+    (tmp_path / 'new').mkdir()
+    shutil.copy(write_key(str(tmp_path / 'new')), path)  # a new key under the same path
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert load_signing_key(path) is not key
+
+
+def test_token_is_minted_on_first_request_and_reused(api, stub):
+    assert api._token is None
+    api.get_subscription_group('sg-1')
+    api.get_subscription_group('sg-2')
+    assert len({authorization for _, _, authorization in stub.state.calls}) == 1
+
+    token = api.token
+    assert jwt.get_unverified_header(token)['kid'] == 'KEY'
+    claims = jwt.decode(token, verify=False)
+    assert (claims['iss'], claims['aud']) == ('issuer', 'appstoreconnect-v1')
+    assert claims['exp'] - time.time() == pytest.approx(TOKEN_LIFETIME, abs=5)
+
+
+def test_token_is_refreshed_ahead_of_expiry(api):
+    first = api.token
+    api.token_gen_date = datetime.now() - timedelta(minutes=13)
+    api.token  # still valid, the next one is minted in the background
+    assert _wait_for(lambda: api._token != first)
+    assert datetime.now() - api.token_gen_date < timedelta(minutes=1)
+
+    second = api.token
+    api.token_gen_date = datetime.now() - timedelta(minutes=16)
+    assert api.token not in (first, second)
+
+
+def test_memory_store_shares_tokens_between_clients(key_file):
+    store = MemoryTokenStore()
+    clients = [AppStoreConnect('KEY', key_file, 'issuer', token_store=store) for _ in range(3)]
+    assert len({client.token for client in clients}) == 1
+    assert AppStoreConnect('OTHER', key_file, 'issuer', token_store=store).token != clients[0].token
+
+
+def test_file_store_shares_tokens_between_processes(key_file, tmp_path):
+    path = str(tmp_path / 'tokens.json')
+    first = AppStoreConnect('KEY', key_file, 'issuer', token_store=FileTokenStore(path)).token
+    # a second store on the same file stands in for another process
+    assert AppStoreConnect('KEY', key_file, 'issuer', token_store=FileTokenStore(path)).token == first
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    FileTokenStore(path).clear()
+    assert AppStoreConnect('KEY', key_file, 'issuer', token_store=FileTokenStore(path)).token != first
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from apple_api import AsyncAppStoreConnect
+from apple_api.exceptions import InvalidParameterException, UploadFailedException
+from apple_api.uploads import PartReader, file_md5
+
+
+@pytest.fixture
+def screenshot(tmp_path):
+    path = tmp_path / 'screenshot.png'
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    return str(path)
+
+
+def _uploaded(stub, reservation_id):
+    parts = stub.state.reservations[reservation_id]
+    return b''.join(parts[offset] for offset in sorted(parts))
+
+
+def test_part_reader_rewinds():
+    reader = PartReader(memoryview(b'0123456789')[2:8])
+    assert len(reader) == 6 and bytes(reader.read(4)) == b'2345'
+    assert bytes(reader.read()) == b'67' and reader.read(1) == b''
+    reader.seek(-3, os.SEEK_END)
+    assert bytes(reader.read()) == b'567'
+
+
+def test_screenshot_is_uploaded_in_parts_and_committed(api, stub, screenshot):
+    r = api.create_iap_review_screenshot_request('iap-1', screenshot)
+    assert r.json()['data']['attributes']['assetDeliveryState'] == {'state': 'COMPLETE'}
+    with open(screenshot, 'rb') as file:
+        assert _uploaded(stub, 'screenshot-1') == file.read()
+    assert [method for method, _, _ in stub.state.calls] == ['POST', 'PUT', 'PUT', 'PUT', 'PATCH']
+
+
+def test_upload_returns_the_file_checksum(api, stub, screenshot):
+    operations = api.fetch('/v1/inAppPurchaseAppStoreReviewScreenshots', method='post', post_data={
+        'data': {'type': 'inAppPurchaseAppStoreReviewScreenshots',
+                 'attributes': {'fileSize': os.path.getsize(screenshot)}}}).json()['data']['attributes']
+    assert api.upload_asset(operations['uploadOperations'], screenshot, max_workers=2) == file_md5(screenshot)
+    assert hashlib.md5(_uploaded(stub, 'screenshot-1')).hexdigest() == file_md5(screenshot)
+
+
+def test_failed_part_raises(api, stub, screenshot):
+    stub.state.fail('PUT', '/upload/', 500)
+    with pytest.raises(UploadFailedException):
+        api.create_iap_review_screenshot_request('iap-1', screenshot)
+
+
+def test_empty_file_is_rejected(api, tmp_path):
+    (tmp_path / 'empty.png').write_bytes(b'')
+    with pytest.raises(InvalidParameterException):
+        api.upload_asset([{'url': 'http://host/upload', 'offset': 0, 'length': 0}], str(tmp_path / 'empty.png'))
+
+
+def test_async_upload(stub, key_file, screenshot):
+    async def main():
+        async with AsyncAppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url) as api:
+            return await api.create_iap_review_screenshot_request('iap-1', screenshot)
+
+    assert asyncio.run(main()).json()['data']['attributes']['assetDeliveryState'] == {'state': 'COMPLETE'}
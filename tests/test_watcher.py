@@ -0,0 +1,58 @@
+import asyncio
+from urllib.parse import unquote
+
+import pytest
+
+from apple_api import AsyncAppStoreConnect, BuildWatcher
+from apple_api.exceptions import InvalidParameterException
+
+
+def _transitions(transitions):
+    return [(transition.build_id, transition.previous_state, transition.state) for transition in transitions]
+
+
+def test_every_build_of_a_version_is_watched(api, stub):
+    # builds 18 and 19 are two uploads of build number 9 for app-4, e.g. the iOS and the macOS one
+    stub.state.builds_per_version = 2
+    watcher = BuildWatcher(api).add_version('9', app_id='app-4')
+
+    assert _transitions(watcher.poll()) == [('build-18', None, 'PROCESSING'), ('build-19', None, 'FAILED')]
+    assert watcher.pending == {'builds': ['build-18'], 'versions': {}}
+
+
+def test_unseen_builds_then_only_finished_ones_are_asked_for(api, stub):
+    watcher = BuildWatcher(api, min_interval=0.01, max_interval=0.02).add_build('build-2').add_build('build-3')
+    transitions = list(watcher.watch(timeout=0.2))
+
+    assert _transitions(transitions) == [('build-2', None, 'VALID'), ('build-3', None, 'PROCESSING')]
+    assert watcher.pending['builds'] == ['build-3']
+    queries = [unquote(path) for _, path, _ in stub.state.calls]
+    assert 'filter[processingState]' not in queries[0]
+    assert len(queries) > 1 and all('filter[processingState]=VALID,FAILED,INVALID' in query for query in queries[1:])
+    assert all('fields[builds]=version,processingState,uploadedDate' in query for query in queries)
+
+
+def test_interval_backs_off_until_something_changes(api):
+    watcher = BuildWatcher(api, min_interval=10, max_interval=40, backoff=2)
+    for expected in (20, 40, 40):
+        assert 0.9 * expected <= watcher._next_interval([]) <= 1.1 * expected
+
+    watcher._apply(None, [])
+    watcher.add_build('build-3')._apply(None, [{'id': 'build-3', 'attributes': {'processingState': 'PROCESSING'}}])
+    changed = watcher._apply(None, [{'id': 'build-3', 'attributes': {'processingState': 'VALID'}}])
+    assert watcher._next_interval(changed) <= 11 and watcher.pending['builds'] == []
+
+
+def test_version_needs_an_app(api):
+    api.app_id = None
+    with pytest.raises(InvalidParameterException):
+        BuildWatcher(api).add_version('9')
+
+
+def test_async_watch(stub, key_file):
+    async def main():
+        async with AsyncAppStoreConnect('KEY', key_file, 'issuer', base_api=stub.base_url) as api:
+            watcher = BuildWatcher(api, min_interval=0.01).add_build('build-0').add_build('build-4')
+            return [transition async for transition in watcher.awatch(timeout=5)]
+
+    assert _transitions(asyncio.run(main())) == [('build-0', None, 'VALID'), ('build-4', None, 'FAILED')]